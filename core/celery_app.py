@@ -2,13 +2,10 @@ import os
 import time
 import celery
 
-from django.conf import settings
-
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
 
 app = celery.Celery('core')
-app.config_from_object('django.conf:settings')
-app.conf.broker_url = settings.CELERY_BROKER_URL
+app.config_from_object('django.conf:settings', namespace='CELERY')
 app.autodiscover_tasks()
 
 
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from company.models import Company, Position, ProjectPosition, Project, Department
+from company.models import Company, Position, ProjectPosition, Project, Department, ProjectAccess, ChangeLog, UserImport
 
 
 admin.site.register(Company)
@@ -7,3 +7,6 @@ admin.site.register(Position)
 admin.site.register(ProjectPosition)
 admin.site.register(Project)
 admin.site.register(Department)
+admin.site.register(ProjectAccess)
+admin.site.register(ChangeLog)
+admin.site.register(UserImport)
@@ -0,0 +1,445 @@
+import json
+import statistics
+import time
+import tracemalloc
+from collections import namedtuple
+from functools import partial
+from importlib import import_module
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection, transaction
+from django.db.models.functions import Length
+from django.test.client import BOUNDARY, MULTIPART_CONTENT, encode_multipart
+from django.test.utils import override_settings
+from django.urls import URLPattern, URLResolver, reverse
+from rest_framework import serializers
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from company.models import Company, Position, Project, ProjectPosition, Department, UserImport
+from company.serializers import (
+    DepartmentNoUsersSerializer, ExternalAPIRequestPositionNoUsersSerializer, PositionForProjectSerializer, )
+from company.services import rebuild_project_access
+from jwt_registration.models import User
+from jwt_registration.serializers import UserSerializer
+
+BENCHMARK_URLCONFS = ('company.urls', 'users.urls', 'jwt_registration.urls')
+HTTP_METHODS = ('get', 'post', 'put', 'patch', 'delete')
+
+Scenario = namedtuple('Scenario', ('url_name', 'method', 'kwargs', 'data', 'setup'), defaults=({}, None, None))
+
+
+def get_benchmark_email(index):
+    return f'benchmark_user_{index}@{settings.BENCHMARK_EMAIL_DOMAIN}'
+
+
+def _bulk_create_through(descriptor, rows, batch_size):
+    through = descriptor.through
+    source_field = descriptor.field.m2m_column_name()
+    target_field = descriptor.field.m2m_reverse_name()
+    through.objects.bulk_create(
+        [through(**{source_field: source_id, target_field: target_id}) for source_id, target_id in rows],
+        batch_size=batch_size, ignore_conflicts=True
+    )
+
+
+def _slice(items, index, size):
+    start = index * size % len(items)
+    return items[start:start + size]
+
+
+@transaction.atomic
+def seed_benchmark_company(users=10000, positions=200, projects=1000, department_depth=6, department_children=3,
+                           users_per_position=10, users_per_department=20, users_per_project=10, batch_size=2000):
+    User.objects.bulk_create(
+        [User(email=get_benchmark_email(index), is_registered=True) for index in range(users)],
+        batch_size=batch_size, ignore_conflicts=True
+    )
+    user_ids = list(User.objects.filter(
+        email__in=[get_benchmark_email(index) for index in range(users)]).order_by('id').values_list('id', flat=True))
+
+    company = Company.objects.create(title=settings.BENCHMARK_COMPANY_TITLE, description='benchmark data')
+    _bulk_create_through(Company.users, [(company.id, user_id) for user_id in user_ids], batch_size)
+
+    weights = Position.WeightChoices.values
+    position_objects = Position.objects.bulk_create([
+        Position(company=company, title=f'position {index}', access_weight=weights[index % len(weights)])
+        for index in range(positions)
+    ], batch_size=batch_size)
+    _bulk_create_through(Position.users, [
+        (position.id, user_id) for index, position in enumerate(position_objects)
+        for user_id in _slice(user_ids, index, users_per_position)
+    ], batch_size)
+
+    departments, parents = [], [None]
+    for level in range(department_depth):
+        level_departments = Department.objects.bulk_create([
+            Department(company=company, parent=parent, title=f'department {level}.{index}')
+            for index, parent in enumerate(parent for parent in parents for _ in range(department_children))
+        ], batch_size=batch_size)
+        for department in level_departments:
+            department.path = f'{department.parent.path if department.parent else ""}{department.id}/'
+        Department.objects.bulk_update(level_departments, ['path'], batch_size=batch_size)
+        departments += level_departments
+        parents = level_departments
+    _bulk_create_through(Department.users, [
+        (department.id, user_id) for index, department in enumerate(departments)
+        for user_id in _slice(user_ids, index, users_per_department)
+    ], batch_size)
+
+    project_objects = Project.objects.bulk_create([
+        Project(company=company, title=f'project {index}', description='benchmark project')
+        for index in range(projects)
+    ], batch_size=batch_size)
+    chunk_size = max(batch_size // max(positions, 1), 1)
+    for index in range(0, len(project_objects), chunk_size):
+        chunk = project_objects[index:index + chunk_size]
+        ProjectPosition.objects.bulk_create([
+            ProjectPosition(project=project, position=position)
+            for project in chunk for position in position_objects
+        ], batch_size=batch_size)
+        rebuild_project_access(project_ids=[project.id for project in chunk])
+    _bulk_create_through(Project.users, [
+        (project.id, user_id) for index, project in enumerate(project_objects)
+        for user_id in _slice(user_ids, index, users_per_project)
+    ], batch_size)
+    _bulk_create_through(Project.departments, [
+        (project.id, departments[index % len(departments)].id) for index, project in enumerate(project_objects)
+    ] if departments else [], batch_size)
+    return company
+
+
+def flush_benchmark_data():
+    Company.objects.filter(title=settings.BENCHMARK_COMPANY_TITLE).delete()
+    User.objects.filter(email__endswith=f'@{settings.BENCHMARK_EMAIL_DOMAIN}').delete()
+
+
+def get_benchmark_fixture():
+    company = Company.objects.filter(title=settings.BENCHMARK_COMPANY_TITLE).order_by('-id').first()
+    if company is None:
+        raise ValueError('benchmark data is missing, run seed_benchmark_data first')
+    position = Position.objects.filter(company=company, users__isnull=False).order_by('-id').first()
+    member = position.users.order_by('id').first()
+    departments = Department.objects.filter(company=company)
+    return {
+        'company_id': company.id,
+        'company_title': company.title,
+        'position_id': position.id,
+        'project_id': Project.objects.filter(company=company).order_by('id').values_list('id', flat=True).first(),
+        'department_id': departments.order_by(Length('path').desc(), 'id').values_list('id', flat=True).first(),
+        'user_id': member.id,
+        'email': member.email,
+        'emails': list(company.users.order_by('id').values_list('email', flat=True)[:100]),
+    }
+
+
+def create_disposable_company(fixture):
+    return {'pk': Company.objects.create(title='benchmark disposable company').id}
+
+
+def create_disposable_position(fixture):
+    return {'pk': Position.objects.create(company_id=fixture['company_id'], title='benchmark disposable').id}
+
+
+def create_disposable_project(fixture):
+    return {'pk': Project.objects.create(company_id=fixture['company_id'], title='benchmark disposable').id}
+
+
+def create_disposable_department(fixture):
+    return {'pk': Department.objects.create(company_id=fixture['company_id'], title='benchmark disposable').id}
+
+
+def create_disposable_user(fixture):
+    return {'pk': User.objects.create(email=f'disposable@{settings.BENCHMARK_EMAIL_DOMAIN}').id}
+
+
+def build_user_import_upload(fixture):
+    emails = fixture['emails'] + [f'benchmark_import_{index}@{settings.BENCHMARK_EMAIL_DOMAIN}' for index in range(100)]
+    # positions are left out: their project access rebuild is measured by company-position-bulk-membership
+    content = 'email,department\n' + ''.join(f'{email},{fixture["department_id"]}\n' for email in emails)
+    return {'file': SimpleUploadedFile('users.csv', content.encode())}
+
+
+def create_user_import(fixture):
+    user_import = UserImport.objects.create(company_id=fixture['company_id'])
+    return {'pk': fixture['company_id'], 'import_pk': user_import.id}
+
+
+def get_scenarios(fixture):
+    company = {'pk': fixture['company_id']}
+    nested = {'company_pk': fixture['company_id']}
+    position = {**nested, 'pk': fixture['position_id']}
+    project = {**nested, 'pk': fixture['project_id']}
+    department = {**nested, 'pk': fixture['department_id']}
+    users = [{'email': fixture['email']}]
+    membership = {'emails': fixture['emails']}
+    new_email = f'benchmark_new_user@{settings.BENCHMARK_EMAIL_DOMAIN}'
+    new_emails = [f'benchmark_new_user_{index}@{settings.BENCHMARK_EMAIL_DOMAIN}' for index in range(100)]
+    return [
+        Scenario('company-list', 'get'),
+        Scenario('company-list', 'post', data={'title': 'benchmark new company', 'users': users}),
+        Scenario('company-export', 'get'),
+        Scenario('company-detail', 'get', company),
+        Scenario('company-detail', 'put', company, {'title': fixture['company_title'], 'users': []}),
+        Scenario('company-detail', 'patch', company, {'description': 'benchmark'}),
+        Scenario('company-detail', 'delete', setup=create_disposable_company),
+        Scenario('company-bulk-membership', 'post', company, membership),
+        Scenario('company-changes', 'get', company, {'since': 0}),
+        Scenario('company-get-users-email-only', 'get', company),
+        Scenario('company-import-users', 'post', company, build_user_import_upload),
+        Scenario('company-user-import', 'get', setup=create_user_import),
+        Scenario('company-position-list', 'get', nested),
+        Scenario('company-position-list', 'post', nested,
+                 {'title': 'benchmark position', 'company': fixture['company_id'], 'users': users}),
+        Scenario('company-position-export', 'get', nested),
+        Scenario('company-position-detail', 'get', position),
+        Scenario('company-position-detail', 'put', position,
+                 {'title': 'benchmark position', 'company': fixture['company_id'], 'users': []}),
+        Scenario('company-position-detail', 'patch', position, {'description': 'benchmark'}),
+        Scenario('company-position-detail', 'delete', nested, setup=create_disposable_position),
+        Scenario('company-position-bulk-membership', 'post', position, membership),
+        Scenario('company-project-list', 'get', nested),
+        Scenario('company-project-list', 'post', nested,
+                 {'title': 'benchmark project', 'company': fixture['company_id'], 'users': users}),
+        Scenario('company-project-bulk-create', 'post', nested,
+                 [{'title': f'benchmark bulk project {index}', 'users': users} for index in range(10)]),
+        Scenario('company-project-export', 'get', nested),
+        Scenario('company-project-detail', 'get', project),
+        Scenario('company-project-detail', 'patch', project, {'description': 'benchmark'}),
+        Scenario('company-project-detail', 'delete', nested, setup=create_disposable_project),
+        Scenario('company-project-access', 'get', {**project, 'user_pk': fixture['user_id']}),
+        Scenario('company-project-bulk-membership', 'post', project, membership),
+        Scenario('company-department-list', 'get', nested),
+        Scenario('company-department-list', 'post', nested,
+                 {'title': 'benchmark department', 'company': fixture['company_id'], 'users': users}),
+        Scenario('company-department-export', 'get', nested),
+        Scenario('company-department-tree', 'get', nested),
+        Scenario('company-department-user-departments', 'get', {**nested, 'user_pk': fixture['user_id']}),
+        Scenario('company-department-detail', 'get', department),
+        Scenario('company-department-detail', 'put', department,
+                 {'title': 'benchmark department', 'company': fixture['company_id'], 'users': []}),
+        Scenario('company-department-detail', 'patch', department, {'description': 'benchmark'}),
+        Scenario('company-department-detail', 'delete', nested, setup=create_disposable_department),
+        Scenario('company-department-ancestors', 'get', department),
+        Scenario('company-department-subtree', 'get', department),
+        Scenario('company-department-bulk-membership', 'post', department, membership),
+        Scenario('user-in-company', 'post', nested, {'email': fixture['email']}),
+        Scenario('users-in-company', 'post', nested, membership),
+        Scenario('users-in-companies', 'post',
+                 data={'pairs': [[fixture['company_id'], email] for email in fixture['emails']]}),
+        Scenario('user-in-company-async', 'post', nested, {'email': fixture['email']}),
+        Scenario('company-users-emails-async', 'get', nested),
+        Scenario('user-company-list', 'get'),
+        Scenario('user-company-export', 'get'),
+        Scenario('user-company-detail', 'get', {'pk': fixture['user_id']}),
+        Scenario('user-list', 'get'),
+        Scenario('user-export', 'get'),
+        Scenario('user-detail', 'get', {'pk': fixture['user_id']}),
+        Scenario('user-detail', 'delete', setup=create_disposable_user),
+        Scenario('user-create-user', 'post', data={'email': new_email}),
+        Scenario('user-confirm-user', 'post', data={'email': new_email}),
+        Scenario('user-rollback-user', 'post', data={'email': fixture['email']}),
+        Scenario('user-bulk-create-users', 'post', data=[{'email': email} for email in new_emails]),
+        Scenario('user-bulk-confirm-users', 'post', data={'emails': new_emails}),
+        Scenario('user-bulk-rollback-users', 'post', data={'emails': fixture['emails']}),
+    ]
+
+
+def get_scenario_name(scenario):
+    return f'{scenario.url_name} {scenario.method.upper()}'
+
+
+def _walk_routes(patterns):
+    for pattern in patterns:
+        if isinstance(pattern, URLResolver):
+            yield from _walk_routes(pattern.url_patterns)
+        elif isinstance(pattern, URLPattern) and pattern.name:
+            view_class = getattr(pattern.callback, 'cls', None) or pattern.callback.view_class
+            actions = getattr(pattern.callback, 'actions', None) or {
+                method: method for method in HTTP_METHODS if hasattr(view_class, method)}
+            for method in actions:
+                if method not in view_class.http_method_names:
+                    continue
+                yield f'{pattern.name} {method.upper()}'
+
+
+def get_route_names():
+    return {
+        name for urlconf in BENCHMARK_URLCONFS
+        for name in _walk_routes(import_module(urlconf).urlpatterns)
+    }
+
+
+def _percentile(values, percent):
+    values = sorted(values)
+    return values[max(int(round(len(values) * percent / 100)) - 1, 0)]
+
+
+def _request(client, scenario, fixture):
+    kwargs = dict(scenario.kwargs)
+    if scenario.setup:
+        kwargs.update(scenario.setup(fixture))
+    url = reverse(scenario.url_name, kwargs=kwargs)
+    data = scenario.data(fixture) if callable(scenario.data) else scenario.data
+    content_type = 'application/json'
+    if isinstance(data, dict) and any(isinstance(value, File) for value in data.values()):
+        data, content_type = encode_multipart(BOUNDARY, data), MULTIPART_CONTENT
+    elif scenario.method != 'get' and data is not None:
+        data = json.dumps(data)
+    queries = []
+
+    def count_queries(execute, sql, params, many, context):
+        queries.append(sql)
+        return execute(sql, params, many, context)
+
+    with connection.execute_wrapper(count_queries):
+        started = time.perf_counter()
+        response = getattr(client, scenario.method)(url, data, content_type=content_type)
+        if response.streaming:
+            b''.join(response.streaming_content)
+        elapsed = time.perf_counter() - started
+    return response.status_code, len(queries), elapsed
+
+
+def run_scenario(client, scenario, fixture, iterations):
+    timings, queries, statuses = [], [], set()
+    for iteration in range(iterations + 1):
+        with transaction.atomic():
+            status, query_count, elapsed = _request(client, scenario, fixture)
+            transaction.set_rollback(True)
+        statuses.add(status)
+        if iteration:
+            timings.append(elapsed)
+            queries.append(query_count)
+
+    with transaction.atomic():
+        tracemalloc.start()
+        try:
+            _request(client, scenario, fixture)
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+        transaction.set_rollback(True)
+
+    return {
+        'status': sorted(statuses),
+        'queries': max(queries),
+        'p50_ms': round(statistics.median(timings) * 1000, 2),
+        'p95_ms': round(_percentile(timings, 95) * 1000, 2),
+        'peak_kb': round(peak / 1024, 1),
+    }
+
+
+def run_benchmark(iterations=20, names=None, fixture=None):
+    fixture = fixture or get_benchmark_fixture()
+    client = APIClient(SERVER_NAME=settings.BENCHMARK_SERVER_NAME)
+    results = {}
+    # the reference route is always measured, latency budgets are relative to it
+    names = names and {*names, settings.BENCHMARK_REFERENCE_ROUTE}
+    # imports run inline so their cost is measured and nothing is queued for rolled back rows
+    with override_settings(USER_IMPORT_ASYNC=False):
+        for scenario in get_scenarios(fixture):
+            name = get_scenario_name(scenario)
+            if names and name not in names:
+                continue
+            results[name] = run_scenario(client, scenario, fixture, iterations)
+    return results
+
+
+def get_uncovered_routes(fixture):
+    return sorted(get_route_names() - {get_scenario_name(scenario) for scenario in get_scenarios(fixture)})
+
+
+def load_budget(path):
+    with open(path) as budget_file:
+        return json.load(budget_file)
+
+
+def get_latency_ratios(results):
+    # milliseconds depend on the machine, the p95 of a route over the p50 of a cheap route
+    # measured in the same run mostly does not
+    reference = results[settings.BENCHMARK_REFERENCE_ROUTE]['p50_ms']
+    return {name: round(metrics['p95_ms'] / reference, 1) for name, metrics in results.items()}
+
+
+def build_budget(results, headroom=None):
+    headroom = headroom or settings.BENCHMARK_BUDGET_HEADROOM
+    latency_ratios = get_latency_ratios(results)
+    return {
+        name: {
+            'queries': metrics['queries'],
+            'latency_ratio': latency_ratios[name],
+            'peak_kb': round(metrics['peak_kb'] * headroom, 1),
+        }
+        for name, metrics in sorted(results.items())
+    }
+
+
+def check_budget(results, budget, tolerance=None):
+    tolerance = tolerance or settings.BENCHMARK_LATENCY_TOLERANCE
+    latency_ratios = get_latency_ratios(results)
+    violations = []
+    for name, metrics in sorted(results.items()):
+        if any(status >= 500 for status in metrics['status']):
+            violations.append(f'{name}: server error {metrics["status"]}')
+        limits = budget.get(name)
+        if limits is None:
+            violations.append(f'{name}: no budget')
+            continue
+        for metric in ('queries', 'peak_kb'):
+            if metric in limits and metrics[metric] > limits[metric]:
+                violations.append(f'{name}: {metric} {metrics[metric]} > {limits[metric]}')
+        # routes as cheap as the reference are noise at this resolution
+        if 'latency_ratio' in limits and latency_ratios[name] > max(limits['latency_ratio'], 1) * tolerance:
+            violations.append(
+                f'{name}: latency_ratio {latency_ratios[name]} > {limits["latency_ratio"]} x {tolerance}')
+    return violations
+
+
+def build_serializer_benchmark_rows(rows):
+    positions = []
+    for index in range(rows):
+        position = Position(
+            id=index + 1, title=f'position {index}', description=None if index % 2 else 'description',
+            access_weight=index % 5, company_id=1
+        )
+        position.current_project_positions = [
+            ProjectPosition(position_id=position.id, project_access_weight=weight) for weight in (1, 5)]
+        positions.append(position)
+    return {
+        UserSerializer: [User(id=index + 1, email=get_benchmark_email(index)) for index in range(rows)],
+        DepartmentNoUsersSerializer: [
+            Department(
+                id=index + 1, title=f'department {index}', description=None if index % 2 else 'description',
+                parent_id=index or None, company_id=1, color='rgb(200,200,200)', owner=get_benchmark_email(index)
+            )
+            for index in range(rows)
+        ],
+        ExternalAPIRequestPositionNoUsersSerializer: positions,
+        PositionForProjectSerializer: positions,
+    }
+
+
+def _time_representation(to_representation, instances):
+    started = time.process_time()
+    data = [to_representation(instance) for instance in instances]
+    return time.process_time() - started, data
+
+
+def run_serializer_benchmark(rows=10000):
+    renderer = JSONRenderer()
+    results = {}
+    for serializer_class, instances in build_serializer_benchmark_rows(rows).items():
+        serializer = serializer_class()
+        drf_time, drf_data = _time_representation(
+            partial(serializers.Serializer.to_representation, serializer), instances)
+        fast_time, fast_data = _time_representation(serializer.to_representation, instances)
+        results[serializer_class.__name__] = {
+            'identical': renderer.render(drf_data) == renderer.render(fast_data),
+            'drf_ms': round(drf_time * 1000, 1),
+            'fast_ms': round(fast_time * 1000, 1),
+            'saved_ms_per_10k': round((drf_time - fast_time) * 1000 * 10000 / rows, 1),
+        }
+    return results
@@ -0,0 +1,103 @@
+import time
+from functools import partial
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from rest_framework.exceptions import NotFound
+
+from company.models import Company
+from jwt_registration.models import User
+
+
+def get_company_version_key(company_id):
+    return settings.COMPANY_VERSION_CACHE_KEY.format(company_id=company_id)
+
+
+def get_company_version(company_id):
+    key = get_company_version_key(company_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns(), None)
+        version = cache.get(key)
+    return version
+
+
+async def aget_company_version(company_id):
+    key = get_company_version_key(company_id)
+    version = await cache.aget(key)
+    if version is None:
+        await cache.aadd(key, time.time_ns(), None)
+        version = await cache.aget(key)
+    return version
+
+
+def set_company_version(company_ids):
+    version = time.time_ns()
+    cache.set_many({get_company_version_key(company_id): version for company_id in company_ids}, None)
+
+
+def bump_company_version(*company_ids):
+    # a reader racing an open transaction would cache the old rows under the new version
+    if company_ids:
+        transaction.on_commit(partial(set_company_version, company_ids))
+
+
+def get_member_cache_key(company_id, version, email):
+    return settings.COMPANY_MEMBER_CACHE_KEY.format(company_id=company_id, version=version, email=email)
+
+
+def is_user_in_company(company_id, email):
+    key = get_member_cache_key(company_id, get_company_version(company_id), email)
+    is_member = cache.get(key)
+    if is_member is None:
+        membership = Company.users.through.objects.filter(
+            company_id=OuterRef('id'), user__email=email)
+        result = Company.objects.filter(id=company_id).values_list(Exists(membership), flat=True).first()
+        if result is None:
+            raise NotFound({'status': 'Company not found'})
+        is_member = result
+        cache.set(key, is_member, settings.CACHE_LIFE_TIME)
+    return is_member
+
+
+async def ais_user_in_company(company_id, email):
+    key = get_member_cache_key(company_id, await aget_company_version(company_id), email)
+    is_member = await cache.aget(key)
+    if is_member is None:
+        membership = Company.users.through.objects.filter(
+            company_id=OuterRef('id'), user__email=email)
+        result = await Company.objects.filter(id=company_id).values_list(Exists(membership), flat=True).afirst()
+        if result is None:
+            raise NotFound({'status': 'Company not found'})
+        is_member = result
+        await cache.aset(key, is_member, settings.CACHE_LIFE_TIME)
+    return is_member
+
+
+def users_in_company(company_id, emails):
+    version = get_company_version(company_id)
+    keys = {get_member_cache_key(company_id, version, email): email for email in set(emails)}
+    cached = cache.get_many(keys)
+    members = {keys[key] for key, is_member in cached.items() if is_member}
+
+    missing = {email for key, email in keys.items() if key not in cached}
+    if missing:
+        found = set(User.objects.filter(companies=company_id, email__in=missing).values_list('email', flat=True))
+        if not found and not members and not Company.objects.filter(id=company_id).exists():
+            raise NotFound({'status': 'Company not found'})
+        cache.set_many(
+            {key: email in found for key, email in keys.items() if email in missing},
+            settings.CACHE_LIFE_TIME
+        )
+        members |= found
+    return [email for email in dict.fromkeys(emails) if email in members]
+
+
+def pairs_in_companies(pairs):
+    company_ids = {company_id for company_id, _ in pairs}
+    emails = {email for _, email in pairs}
+    members = set(Company.users.through.objects.filter(
+        company_id__in=company_ids, user__email__in=emails).values_list('company_id', 'user__email'))
+    return [int(pair in members) for pair in pairs]
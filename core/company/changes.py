@@ -0,0 +1,160 @@
+import json
+from contextlib import contextmanager
+from datetime import timedelta
+from uuid import uuid4
+
+import redis
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Max, Min
+from django.utils import timezone
+from kombu import Connection, Exchange
+
+from company.models import ChangeLog, Company, Position, Project, Department
+
+_stream_client = None
+
+
+def get_stream_client():
+    global _stream_client
+    if _stream_client is None:
+        _stream_client = redis.Redis.from_url(settings.CHANGE_FEED_REDIS_URL)
+    return _stream_client
+
+
+def record_changes(entries):
+    return ChangeLog.objects.bulk_create([ChangeLog(**entry) for entry in entries])
+
+
+def record_change(company_id, model, object_id, action, relation='', related_ids=None):
+    return record_changes([{
+        'company_id': company_id, 'model': model, 'object_id': object_id,
+        'action': action, 'relation': relation, 'related_ids': sorted(related_ids or []),
+    }])
+
+
+def record_membership_removals(users):
+    # a deleted user's m2m rows go with a cascade that sends no m2m_changed
+    entries = []
+    for model in (Company, Position, Project, Department):
+        name = model._meta.model_name
+        company_field = 'company_id' if model is Company else f'{name}__company_id'
+        removed = {}
+        memberships = model.users.through.objects.filter(user__in=users).values_list(
+            f'{name}_id', company_field, 'user_id')
+        for object_id, company_id, user_id in memberships:
+            removed.setdefault((object_id, company_id), []).append(user_id)
+        entries.extend(
+            {
+                'company_id': company_id, 'model': name, 'object_id': object_id,
+                'action': ChangeLog.Action.REMOVE, 'relation': 'user', 'related_ids': sorted(user_ids),
+            }
+            for (object_id, company_id), user_ids in removed.items()
+        )
+    return record_changes(entries)
+
+
+def serialize_change(change):
+    return {
+        'id': change.id,
+        'sequence': change.sequence,
+        'company_id': change.company_id,
+        'model': change.model,
+        'object_id': change.object_id,
+        'action': change.action,
+        'relation': change.relation,
+        'related_ids': change.related_ids,
+        'created_at': change.created_at.isoformat(),
+    }
+
+
+def get_outbox_exchange():
+    return Exchange(settings.OUTBOX_EXCHANGE, type='topic', durable=True)
+
+
+def get_routing_key(change):
+    return f'company.{change.company_id}.{change.model}.{change.action}'
+
+
+def publish_changes(changes):
+    pipeline = get_stream_client().pipeline(transaction=False)
+    for change in changes:
+        pipeline.xadd(
+            settings.CHANGE_FEED_STREAM_KEY,
+            {'company_id': change.company_id, 'change': json.dumps(serialize_change(change))},
+            maxlen=settings.CHANGE_FEED_STREAM_MAXLEN, approximate=True
+        )
+    pipeline.execute()
+
+
+@contextmanager
+def cache_lock(key, timeout):
+    token = uuid4().hex
+    acquired = cache.add(key, token, timeout)
+    try:
+        yield acquired
+    finally:
+        if acquired and cache.get(key) == token:
+            cache.delete(key)
+
+
+def sequence_changes(batch_size=None):
+    # ids are taken at insert time, so the feed cursor is a sequence handed out to committed
+    # changes under one lock, which keeps it in commit order whether or not the broker is up
+    batch_size = batch_size or settings.OUTBOX_BATCH_SIZE
+    with cache_lock(settings.CHANGE_SEQUENCE_LOCK_CACHE_KEY, settings.CHANGE_SEQUENCE_LOCK_TIMEOUT) as acquired:
+        if not acquired:
+            return 0
+        with transaction.atomic():
+            changes = list(ChangeLog.objects.filter(sequence__isnull=True).order_by('id')[:batch_size])
+            if not changes:
+                return 0
+            last_sequence = ChangeLog.objects.aggregate(sequence=Max('sequence'))['sequence'] or 0
+            for sequence, change in enumerate(changes, last_sequence + 1):
+                change.sequence = sequence
+            ChangeLog.objects.bulk_update(changes, ['sequence'])
+    return len(changes)
+
+
+def publish_outbox_batch(batch_size=None):
+    batch_size = batch_size or settings.OUTBOX_BATCH_SIZE
+    with cache_lock(settings.OUTBOX_LOCK_CACHE_KEY, settings.OUTBOX_LOCK_TIMEOUT) as acquired:
+        if not acquired:
+            return 0
+        with transaction.atomic():
+            changes = list(
+                ChangeLog.objects.select_for_update(skip_locked=True)
+                .filter(published_at__isnull=True, sequence__isnull=False).order_by('sequence')[:batch_size]
+            )
+            if not changes:
+                return 0
+            exchange = get_outbox_exchange()
+            with Connection(settings.OUTBOX_BROKER_URL) as connection:
+                producer = connection.Producer(serializer='json')
+                for change in changes:
+                    producer.publish(
+                        serialize_change(change), exchange=exchange, routing_key=get_routing_key(change),
+                        declare=[exchange], delivery_mode='persistent', retry=True,
+                        retry_policy={'max_retries': settings.OUTBOX_PUBLISH_MAX_RETRIES},
+                    )
+            if settings.CHANGE_FEED_STREAM_KEY:
+                publish_changes(changes)
+            ChangeLog.objects.filter(id__in=[change.id for change in changes]).update(published_at=timezone.now())
+    return len(changes)
+
+
+def prune_changes(retention_days=None):
+    # sequences are contiguous, so everything up to the newest expired one goes and the
+    # oldest remaining sequence tells the feed how far back a consumer can resume
+    retention_days = retention_days or settings.CHANGE_LOG_RETENTION_DAYS
+    expired = ChangeLog.objects.filter(created_at__lt=timezone.now() - timedelta(days=retention_days))
+    horizon = expired.aggregate(sequence=Max('sequence'))['sequence']
+    if horizon is None:
+        return 0
+    deleted, _ = ChangeLog.objects.filter(sequence__lte=horizon).delete()
+    return deleted
+
+
+def get_oldest_sequence():
+    return ChangeLog.objects.aggregate(sequence=Min('sequence'))['sequence']
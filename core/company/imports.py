@@ -0,0 +1,179 @@
+import csv
+import io
+import json
+from functools import partial
+from itertools import islice
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F
+from django.utils import timezone
+from loguru import logger
+
+from company.models import Position, Department, UserImport, UserImportChunk
+from company.services import import_users
+from company.tasks import import_users_chunk
+
+IMPORT_FORMATS = ('csv', 'jsonl')
+
+
+def get_import_format(filename, requested=None):
+    import_format = requested or filename.rsplit('.', 1)[-1].lower()
+    if import_format == 'ndjson':
+        return 'jsonl'
+    return import_format if import_format in IMPORT_FORMATS else 'csv'
+
+
+def read_import_rows(stream, import_format):
+    if import_format == 'jsonl':
+        for line, raw in enumerate(stream, 1):
+            if not raw.strip():
+                continue
+            try:
+                data = json.loads(raw)
+            except ValueError:
+                data = None
+            yield line, data if isinstance(data, dict) else None
+        return
+
+    reader = csv.DictReader(stream)
+    for data in reader:
+        yield reader.line_num, {(key or '').strip().lower(): value for key, value in data.items()}
+
+
+def open_import_file(file, import_format):
+    # csv needs universal newlines off, utf-8-sig drops the BOM spreadsheet exports start with
+    return io.TextIOWrapper(file, encoding='utf-8-sig', newline='' if import_format == 'csv' else None)
+
+
+def get_reference_map(queryset):
+    references = {}
+    for object_id, title in queryset.order_by('id').values_list('id', 'title'):
+        references[str(object_id)] = object_id
+        references.setdefault(title, object_id)
+    return references
+
+
+def clean_import_row(data, positions, departments):
+    if data is None:
+        return None, 'invalid row'
+    email = str(data.get('email') or '').strip()
+    try:
+        validate_email(email)
+    except ValidationError:
+        return None, 'invalid email'
+
+    row = [email]
+    for field, references in (('position', positions), ('department', departments)):
+        value = str(data.get(field) or '').strip()
+        if value and value not in references:
+            return None, f'unknown {field}'
+        row.append(references[value] if value else None)
+    return row, None
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+@transaction.atomic
+def add_import_errors(import_id, errors):
+    user_import = UserImport.objects.select_for_update().only('errors').get(id=import_id)
+    user_import.errors = (user_import.errors + errors)[:settings.USER_IMPORT_MAX_ERRORS]
+    user_import.failed_rows = F('failed_rows') + len(errors)
+    user_import.save(update_fields=['errors', 'failed_rows'])
+
+
+def get_import_chunk_task_id(import_id, index):
+    return f'user-import-{import_id}-{index}'
+
+
+def get_import_chunk_states(user_import):
+    return dict(user_import.chunks.order_by().values_list('status').annotate(count=Count('id')))
+
+
+def finish_user_import(import_id):
+    UserImport.objects.filter(
+        id=import_id, status=UserImport.Status.RUNNING, is_parsed=True,
+        total_rows__lte=F('processed_rows') + F('failed_rows')
+    ).update(status=UserImport.Status.DONE, finished_at=timezone.now())
+
+
+def claim_import_chunk(import_id, index, status):
+    # a redelivered chunk (acks_late) must not be counted twice
+    if UserImportChunk.objects.filter(
+            user_import_id=import_id, index=index, status=UserImportChunk.Status.QUEUED).update(status=status):
+        return True
+    # chunks applied inline are not queued first
+    try:
+        with transaction.atomic():
+            UserImportChunk.objects.create(user_import_id=import_id, index=index, status=status)
+    except IntegrityError:
+        return False
+    return True
+
+
+def apply_import_chunk(import_id, rows, index):
+    company_id = UserImport.objects.values_list('company_id', flat=True).get(id=import_id)
+    report = {'created_users': 0, 'added_users': 0}
+    try:
+        with transaction.atomic():
+            if not claim_import_chunk(import_id, index, UserImportChunk.Status.APPLIED):
+                return report
+            report = import_users(company_id, rows)
+            UserImport.objects.filter(id=import_id).update(
+                processed_rows=F('processed_rows') + len(rows),
+                created_users=F('created_users') + report['created_users'],
+                added_users=F('added_users') + report['added_users'],
+            )
+    except Exception as error:
+        logger.warning(f'User import {import_id} chunk failed: {error}')
+        report = {'created_users': 0, 'added_users': 0}
+        with transaction.atomic():
+            if not claim_import_chunk(import_id, index, UserImportChunk.Status.FAILED):
+                return report
+            add_import_errors(import_id, [{'line': line, 'error': 'import failed'} for line, *_ in rows])
+    finish_user_import(import_id)
+    return report
+
+
+def run_user_import(user_import, rows, asynchronous=True):
+    positions = get_reference_map(Position.objects.filter(company=user_import.company_id))
+    departments = get_reference_map(Department.objects.filter(company=user_import.company_id))
+    total = queued = applied = 0
+    try:
+        for batch in chunked(rows, settings.USER_IMPORT_CHUNK_SIZE):
+            chunk, errors = [], []
+            for line, data in batch:
+                row, error = clean_import_row(data, positions, departments)
+                if error:
+                    errors.append({'line': line, 'error': error})
+                else:
+                    chunk.append([line, *row])
+            total += len(batch)
+            if chunk and asynchronous:
+                UserImportChunk.objects.create(user_import_id=user_import.id, index=queued)
+                transaction.on_commit(partial(
+                    import_users_chunk.apply_async, (user_import.id, chunk, queued),
+                    task_id=get_import_chunk_task_id(user_import.id, queued)
+                ))
+                queued += 1
+            UserImport.objects.filter(id=user_import.id).update(total_rows=total, queued_chunks=queued)
+            if errors:
+                add_import_errors(user_import.id, errors)
+            if chunk and not asynchronous:
+                apply_import_chunk(user_import.id, chunk, applied)
+                applied += 1
+    except (UnicodeDecodeError, csv.Error) as error:
+        add_import_errors(user_import.id, [{'line': total + 1, 'error': f'unreadable file: {error}'}])
+        UserImport.objects.filter(id=user_import.id).update(
+            status=UserImport.Status.FAILED, is_parsed=True, finished_at=timezone.now())
+    else:
+        UserImport.objects.filter(id=user_import.id).update(is_parsed=True)
+        finish_user_import(user_import.id)
+    user_import.refresh_from_db()
+    return user_import
@@ -0,0 +1,56 @@
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+
+from company.benchmark import (
+    run_benchmark, get_benchmark_fixture, get_uncovered_routes, load_budget, build_budget, check_budget, )
+
+
+class Command(BaseCommand):
+    help = 'Measure query counts, latency and peak memory of every API route against the budget file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=20)
+        parser.add_argument('--route', action='append', dest='routes', help='route name such as "company-detail GET"')
+        parser.add_argument('--budget', default=str(settings.BENCHMARK_BUDGET_FILE))
+        parser.add_argument('--update-budget', action='store_true', help='write the measured metrics as the new budget')
+        parser.add_argument('--warm-cache', action='store_true', help='keep the configured cache instead of a dummy one')
+        parser.add_argument('--output', help='write the measured metrics to this json file')
+
+    def handle(self, *args, **options):
+        try:
+            fixture = get_benchmark_fixture()
+        except ValueError as error:
+            raise CommandError(error)
+        uncovered = get_uncovered_routes(fixture)
+        if uncovered:
+            raise CommandError(f'Routes without a benchmark scenario: {", ".join(uncovered)}')
+
+        if options['warm_cache']:
+            results = run_benchmark(options['iterations'], options['routes'], fixture)
+        else:
+            with override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}):
+                results = run_benchmark(options['iterations'], options['routes'], fixture)
+
+        for name, metrics in results.items():
+            self.stdout.write(
+                f'{name:<45} queries={metrics["queries"]:<4} p50={metrics["p50_ms"]}ms '
+                f'p95={metrics["p95_ms"]}ms peak={metrics["peak_kb"]}KB status={metrics["status"]}'
+            )
+        if options['output']:
+            with open(options['output'], 'w') as output_file:
+                json.dump(results, output_file, indent=2)
+
+        if options['update_budget']:
+            with open(options['budget'], 'w') as budget_file:
+                json.dump(build_budget(results), budget_file, indent=2)
+                budget_file.write('\n')
+            self.stdout.write(self.style.SUCCESS(f'Budget written to {options["budget"]}'))
+            return
+
+        violations = check_budget(results, load_budget(options['budget']))
+        if violations:
+            raise CommandError('Benchmark budget exceeded:\n' + '\n'.join(violations))
+        self.stdout.write(self.style.SUCCESS('All routes are within budget'))
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from company.benchmark import run_serializer_benchmark
+
+
+class Command(BaseCommand):
+    help = 'Compare the DRF field pipeline with the fast read path of the hot list serializers'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=10000)
+
+    def handle(self, *args, **options):
+        results = run_serializer_benchmark(options['rows'])
+        for name, metrics in results.items():
+            self.stdout.write(
+                f'{name:<45} drf={metrics["drf_ms"]}ms fast={metrics["fast_ms"]}ms '
+                f'saved_per_10k={metrics["saved_ms_per_10k"]}ms identical={metrics["identical"]}'
+            )
+        if not all(metrics['identical'] for metrics in results.values()):
+            raise CommandError('Fast representation differs from the DRF output')
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from company.imports import IMPORT_FORMATS, get_import_format, read_import_rows, run_user_import
+from company.models import Company, UserImport
+
+
+class Command(BaseCommand):
+    help = 'Import company members from a CSV or JSONL file with email, position and department columns'
+
+    def add_arguments(self, parser):
+        parser.add_argument('company_id', type=int)
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=IMPORT_FORMATS)
+        parser.add_argument('--async', action='store_true', dest='asynchronous',
+                            help='queue chunks to celery instead of importing them in this process')
+
+    def handle(self, *args, **options):
+        if not Company.objects.filter(id=options['company_id']).exists():
+            raise CommandError(f'Company {options["company_id"]} does not exist')
+        import_format = get_import_format(options['path'], options['format'])
+        user_import = UserImport.objects.create(company_id=options['company_id'])
+        with open(options['path'], encoding='utf-8-sig', newline='' if import_format == 'csv' else None) as stream:
+            run_user_import(user_import, read_import_rows(stream, import_format), asynchronous=options['asynchronous'])
+
+        for error in user_import.errors:
+            self.stderr.write(f'line {error["line"]}: {error["error"]}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Import {user_import.id} {user_import.status}: {user_import.total_rows} rows, '
+            f'{user_import.processed_rows} processed, {user_import.failed_rows} failed, '
+            f'{user_import.created_users} users created, {user_import.added_users} added to the company'
+        ))
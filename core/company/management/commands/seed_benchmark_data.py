@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+
+from company.benchmark import seed_benchmark_company, flush_benchmark_data
+
+
+class Command(BaseCommand):
+    help = 'Seed a large company used by the benchmark command'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10000)
+        parser.add_argument('--positions', type=int, default=200)
+        parser.add_argument('--projects', type=int, default=1000)
+        parser.add_argument('--department-depth', type=int, default=6)
+        parser.add_argument('--department-children', type=int, default=3)
+        parser.add_argument('--users-per-position', type=int, default=10)
+        parser.add_argument('--users-per-department', type=int, default=20)
+        parser.add_argument('--users-per-project', type=int, default=10)
+        parser.add_argument('--flush', action='store_true', help='remove previously seeded benchmark data first')
+
+    def handle(self, *args, **options):
+        if options['flush']:
+            flush_benchmark_data()
+        company = seed_benchmark_company(
+            users=options['users'],
+            positions=options['positions'],
+            projects=options['projects'],
+            department_depth=options['department_depth'],
+            department_children=options['department_children'],
+            users_per_position=options['users_per_position'],
+            users_per_department=options['users_per_department'],
+            users_per_project=options['users_per_project'],
+        )
+        self.stdout.write(self.style.SUCCESS(f'Seeded benchmark company {company.id}'))
@@ -0,0 +1,36 @@
+# Generated by Django 5.1.1 on 2026-10-18 13:10
+
+from django.db import migrations, models
+
+
+def fill_department_paths(apps, schema_editor):
+    Department = apps.get_model('company', 'Department')
+    departments = list(Department.objects.only('id', 'parent_id'))
+    parents = {department.id: department.parent_id for department in departments}
+    paths = {}
+
+    def get_path(department_id):
+        if department_id not in paths:
+            parent_id = parents[department_id]
+            paths[department_id] = (get_path(parent_id) if parent_id else '') + f'{department_id}/'
+        return paths[department_id]
+
+    for department in departments:
+        department.path = get_path(department.id)
+    Department.objects.bulk_update(departments, ['path'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('company', '0002_alter_position_options_project_color_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='department',
+            name='path',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, help_text='materialized path of department ids from the root', max_length=255),
+        ),
+        migrations.RunPython(fill_department_paths, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 5.1.1 on 2026-10-18 13:11
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Case, F, Min, Q, When
+
+
+def fill_project_access(apps, schema_editor):
+    ProjectPosition = apps.get_model('company', 'ProjectPosition')
+    ProjectAccess = apps.get_model('company', 'ProjectAccess')
+    weight = Case(
+        When(Q(position__access_weight=0) | Q(project_access_weight=5), then=F('position__access_weight')),
+        default=F('project_access_weight'),
+    )
+    rows = ProjectPosition.objects.filter(position__users__isnull=False).values(
+        'position__users', 'project_id').annotate(weight=Min(weight))
+    ProjectAccess.objects.bulk_create([
+        ProjectAccess(user_id=row['position__users'], project_id=row['project_id'], access_weight=row['weight'])
+        for row in rows
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('company', '0003_department_path'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProjectAccess',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('access_weight', models.PositiveSmallIntegerField(choices=[(0, 'Owner'), (1, 'Setting up project parameters'), (2, 'Executing and assigning tasks'), (3, 'Executing tasks'), (4, 'Observer')], help_text='strongest access level of the user in the project')),
+                ('project', models.ForeignKey(help_text='connection with Project', on_delete=django.db.models.deletion.CASCADE, related_name='user_accesses', to='company.project')),
+                ('user', models.ForeignKey(help_text='connection with User', on_delete=django.db.models.deletion.CASCADE, related_name='project_accesses', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Project Access',
+                'verbose_name_plural': 'Project Accesses',
+                'constraints': [models.UniqueConstraint(fields=('project', 'user'), name='unique_project_access')],
+            },
+        ),
+        migrations.RunPython(fill_project_access, migrations.RunPython.noop),
+    ]
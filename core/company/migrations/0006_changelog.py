@@ -0,0 +1,34 @@
+# Generated by Django 5.1.1 on 2026-10-18 13:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('company', '0005_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChangeLog',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('company_id', models.BigIntegerField(help_text='company the change belongs to')),
+                ('model', models.CharField(max_length=50)),
+                ('object_id', models.BigIntegerField()),
+                ('action', models.CharField(choices=[('create', 'Create'), ('update', 'Update'), ('delete', 'Delete'), ('add', 'Add related'), ('remove', 'Remove related'), ('clear', 'Clear related')], max_length=10)),
+                ('relation', models.CharField(blank=True, default='', max_length=50)),
+                ('related_ids', models.JSONField(blank=True, default=list)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('published_at', models.DateTimeField(blank=True, editable=False, null=True)),
+                ('sequence', models.BigIntegerField(blank=True, editable=False, help_text='feed position, assigned in commit order once the change is committed', null=True, unique=True)),
+            ],
+            options={
+                'verbose_name': 'Change Log',
+                'verbose_name_plural': 'Change Logs',
+                'ordering': ['id'],
+                'indexes': [models.Index(fields=['company_id', 'sequence'], name='changelog_company_seq_idx'), models.Index(condition=models.Q(('sequence__isnull', True)), fields=['id'], name='changelog_unsequenced_idx'), models.Index(condition=models.Q(('published_at__isnull', True)), fields=['sequence'], name='changelog_unpublished_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.1.1 on 2026-10-18 13:22
+
+from django.db import migrations, models
+from django.db.models import Min
+
+
+def remove_duplicate_project_positions(apps, schema_editor):
+    ProjectPosition = apps.get_model('company', 'ProjectPosition')
+    keep_ids = ProjectPosition.objects.values('position_id', 'project_id').annotate(keep_id=Min('id')).values('keep_id')
+    ProjectPosition.objects.exclude(id__in=keep_ids).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('company', '0006_changelog'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='company',
+            index=models.Index(fields=['title'], name='company_title_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='department',
+            index=models.Index(fields=['company', 'parent'], name='department_company_parent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='position',
+            index=models.Index(fields=['company', 'access_weight'], name='position_company_weight_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='project',
+            index=models.Index(fields=['company', 'title'], name='project_company_title_idx'),
+        ),
+        migrations.RunPython(remove_duplicate_project_positions, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='projectposition',
+            constraint=models.UniqueConstraint(fields=('position', 'project'), name='unique_project_position'),
+        ),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 5.1.1 on 2026-10-18 14:07
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('company', '0007_query_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserImport',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')], default='running', max_length=10)),
+                ('is_parsed', models.BooleanField(default=False, help_text='the whole file has been read and queued')),
+                ('total_rows', models.PositiveIntegerField(default=0)),
+                ('processed_rows', models.PositiveIntegerField(default=0)),
+                ('failed_rows', models.PositiveIntegerField(default=0)),
+                ('queued_chunks', models.PositiveIntegerField(default=0)),
+                ('created_users', models.PositiveIntegerField(default=0)),
+                ('added_users', models.PositiveIntegerField(default=0)),
+                ('errors', models.JSONField(blank=True, default=list)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('company', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='user_imports', to='company.company')),
+            ],
+            options={
+                'verbose_name': 'User Import',
+                'verbose_name_plural': 'User Imports',
+                'ordering': ['-id'],
+            },
+        ),
+        migrations.CreateModel(
+            name='UserImportChunk',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('index', models.PositiveIntegerField()),
+                ('status', models.CharField(choices=[('queued', 'Queued'), ('applied', 'Applied'), ('failed', 'Failed')], default='queued', max_length=10)),
+                ('user_import', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='chunks', to='company.userimport')),
+            ],
+            options={
+                'verbose_name': 'User Import Chunk',
+                'verbose_name_plural': 'User Import Chunks',
+                'constraints': [models.UniqueConstraint(fields=('user_import', 'index'), name='unique_user_import_chunk')],
+            },
+        ),
+    ]
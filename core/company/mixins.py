@@ -29,6 +29,4 @@ class UserHandlingMixin:
                 if is_remove:
                     instance.users.remove(*users)
                 else:
-                    existing_users = set(instance.users.all())
-                    new_users = set(users)
-                    instance.users.add(*(new_users - existing_users))
\ No newline at end of file
+                    instance.users.add(*users)
\ No newline at end of file
@@ -12,11 +12,15 @@ class Company(models.Model):
         User, related_name='companies',
         help_text=_('connection with User')
     )
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         verbose_name = _("Company")
         verbose_name_plural = _("Companies")
         ordering = ['title']
+        indexes = [
+            models.Index(fields=('title',), name='company_title_idx')
+        ]
 
     def __str__(self):
         return self.title
@@ -51,11 +55,15 @@ class Position(models.Model):
         related_name='positions',
         help_text=_('connection with Project')
     )
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         verbose_name = _("Position")
         verbose_name_plural = _("Positions")
         ordering = ['access_weight']
+        indexes = [
+            models.Index(fields=('company', 'access_weight'), name='position_company_weight_idx')
+        ]
 
     def __str__(self):
         return self.title
@@ -83,6 +91,9 @@ class ProjectPosition(models.Model):
     class Meta:
         verbose_name = _("Project Position")
         verbose_name_plural = _("Project Positions")
+        constraints = [
+            models.UniqueConstraint(fields=('position', 'project'), name='unique_project_position')
+        ]
 
     def __str__(self):
         return f"{self.position.title} - {self.project.title}"
@@ -119,12 +130,16 @@ class Project(models.Model):
     )
     creation_date = models.DateField(auto_now_add=True, editable=False)
     date_of_update = models.DateField(auto_now=True)
+    updated_at = models.DateTimeField(auto_now=True)
     owner = models.EmailField(null=True, blank=True)
 
     class Meta:
         verbose_name = _("Project")
         verbose_name_plural = _("Projects")
         ordering = ['title']
+        indexes = [
+            models.Index(fields=('company', 'title'), name='project_company_title_idx')
+        ]
 
     def __str__(self):
         return self.title
@@ -144,6 +159,12 @@ class Department(models.Model):
         related_name='children',
         help_text=_('connection with department parent')
     )
+    path = models.CharField(
+        max_length=255, blank=True, default='',
+        db_index=True, editable=False,
+        help_text=_('materialized path of department ids from the root')
+    )
+    updated_at = models.DateTimeField(auto_now=True)
     color = models.CharField(
         max_length=20,
         default=f'rgb({random.randint(150, 220)},{random.randint(150, 220)},{random.randint(150, 220)})'
@@ -157,6 +178,133 @@ class Department(models.Model):
     class Meta:
         verbose_name = _("Department")
         verbose_name_plural = _("Departments")
+        indexes = [
+            models.Index(fields=('company', 'parent'), name='department_company_parent_idx')
+        ]
 
     def __str__(self):
         return self.title
+
+    def get_ancestor_ids(self):
+        return [int(department_id) for department_id in self.path.split('/')[:-2]]
+
+
+
+class ProjectAccess(models.Model):
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE,
+        related_name='project_accesses',
+        help_text=_('connection with User')
+    )
+    project = models.ForeignKey(
+        Project, on_delete=models.CASCADE,
+        related_name='user_accesses',
+        help_text=_('connection with Project')
+    )
+    access_weight = models.PositiveSmallIntegerField(
+        choices=Position.WeightChoices.choices,
+        help_text=_("strongest access level of the user in the project")
+    )
+
+    class Meta:
+        verbose_name = _("Project Access")
+        verbose_name_plural = _("Project Accesses")
+        constraints = [
+            models.UniqueConstraint(fields=('project', 'user'), name='unique_project_access')
+        ]
+
+    def __str__(self):
+        return f"{self.user} - {self.project} ({self.get_access_weight_display()})"
+
+
+
+class ChangeLog(models.Model):
+    class Action(models.TextChoices):
+        CREATE = 'create', _('Create')
+        UPDATE = 'update', _('Update')
+        DELETE = 'delete', _('Delete')
+        ADD = 'add', _('Add related')
+        REMOVE = 'remove', _('Remove related')
+        CLEAR = 'clear', _('Clear related')
+
+    company_id = models.BigIntegerField(help_text=_('company the change belongs to'))
+    model = models.CharField(max_length=50)
+    object_id = models.BigIntegerField()
+    action = models.CharField(max_length=10, choices=Action.choices)
+    relation = models.CharField(max_length=50, blank=True, default='')
+    related_ids = models.JSONField(default=list, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    published_at = models.DateTimeField(null=True, blank=True, editable=False)
+    sequence = models.BigIntegerField(
+        null=True, blank=True, unique=True, editable=False,
+        help_text=_('feed position, assigned in commit order once the change is committed')
+    )
+
+    class Meta:
+        verbose_name = _("Change Log")
+        verbose_name_plural = _("Change Logs")
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=('company_id', 'sequence'), name='changelog_company_seq_idx'),
+            models.Index(fields=('id',), condition=models.Q(sequence__isnull=True), name='changelog_unsequenced_idx'),
+            models.Index(
+                fields=('sequence',), condition=models.Q(published_at__isnull=True), name='changelog_unpublished_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.action} {self.model} {self.object_id}"
+
+
+class UserImport(models.Model):
+    class Status(models.TextChoices):
+        RUNNING = 'running', _('Running')
+        DONE = 'done', _('Done')
+        FAILED = 'failed', _('Failed')
+
+    company = models.ForeignKey(
+        Company, on_delete=models.CASCADE,
+        related_name='user_imports'
+    )
+    status = models.CharField(max_length=10, choices=Status.choices, default=Status.RUNNING)
+    is_parsed = models.BooleanField(default=False, help_text=_('the whole file has been read and queued'))
+    total_rows = models.PositiveIntegerField(default=0)
+    processed_rows = models.PositiveIntegerField(default=0)
+    failed_rows = models.PositiveIntegerField(default=0)
+    queued_chunks = models.PositiveIntegerField(default=0)
+    created_users = models.PositiveIntegerField(default=0)
+    added_users = models.PositiveIntegerField(default=0)
+    errors = models.JSONField(default=list, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = _("User Import")
+        verbose_name_plural = _("User Imports")
+        ordering = ['-id']
+
+    def __str__(self):
+        return f"{self.company_id} import {self.id} ({self.status})"
+
+
+class UserImportChunk(models.Model):
+    class Status(models.TextChoices):
+        QUEUED = 'queued', _('Queued')
+        APPLIED = 'applied', _('Applied')
+        FAILED = 'failed', _('Failed')
+
+    user_import = models.ForeignKey(
+        UserImport, on_delete=models.CASCADE,
+        related_name='chunks'
+    )
+    index = models.PositiveIntegerField()
+    status = models.CharField(max_length=10, choices=Status.choices, default=Status.QUEUED)
+
+    class Meta:
+        verbose_name = _("User Import Chunk")
+        verbose_name_plural = _("User Import Chunks")
+        constraints = [
+            models.UniqueConstraint(fields=('user_import', 'index'), name='unique_user_import_chunk')
+        ]
+
+    def __str__(self):
+        return f"{self.user_import_id} chunk {self.index}"
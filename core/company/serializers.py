@@ -1,11 +1,14 @@
+from django.conf import settings
 from rest_framework import serializers
 
 from company.tasks import notify_users_created
 from jwt_registration.models import User
 from jwt_registration.serializers import UserSerializer
-from company.models import Company, Position, Project, Department
+from company.models import Company, Position, Project, Department, ProjectAccess, ProjectPosition, ChangeLog, UserImport
+from company.imports import get_import_chunk_states
 from company.mixins import UserHandlingMixin
-from loguru import logger
+from company.services import provision_company
+from core.serializers import FastRepresentationMixin, get_choice_display
 
 
 class CompanySerializer(UserHandlingMixin, serializers.ModelSerializer):
@@ -16,6 +19,11 @@ class CompanySerializer(UserHandlingMixin, serializers.ModelSerializer):
         model = Company
         fields = ('id', 'title', 'users', 'description', 'is_remove')
 
+    def create(self, validated_data):
+        validated_data.pop('is_remove', False)
+        users_data = validated_data.pop('users', [])
+        return provision_company(validated_data, [user_data['email'] for user_data in users_data])
+
     @staticmethod
     def _set_users(instance, users_data: list, is_remove=False, created=True):
         if isinstance(users_data, list) and users_data:
@@ -35,9 +43,7 @@ class CompanySerializer(UserHandlingMixin, serializers.ModelSerializer):
                 if is_remove:
                     instance.users.remove(*existing_users)
                 else:
-                    current_users = set(instance.users.all())
-                    users_to_add = set(existing_users) - current_users
-                    instance.users.add(*users_to_add)
+                    instance.users.add(*existing_users)
 
 
 class CompanyForUserSerializer(serializers.ModelSerializer):
@@ -59,10 +65,10 @@ class PositionSerializer(UserHandlingMixin, serializers.ModelSerializer):
         )
 
     def get_access_weight(self, obj):
-        return obj.get_access_weight_display()
+        return get_choice_display(Position.WeightChoices, obj.access_weight)
 
 
-class ExternalAPIRequestPositionNoUsersSerializer(PositionSerializer):
+class ExternalAPIRequestPositionNoUsersSerializer(FastRepresentationMixin, PositionSerializer):
     class Meta:
         model = Position
         fields = (
@@ -79,7 +85,7 @@ class PositionNoUsersSerializer(serializers.Serializer):
     company = serializers.IntegerField()
 
 
-class PositionForProjectSerializer(serializers.ModelSerializer):
+class PositionForProjectSerializer(FastRepresentationMixin, serializers.ModelSerializer):
     access_weight = serializers.SerializerMethodField()
     project_positions = serializers.SerializerMethodField()
 
@@ -89,11 +95,16 @@ class PositionForProjectSerializer(serializers.ModelSerializer):
         read_only_fields = ('id', 'title', 'access_weight')
 
     def get_project_positions(self, obj):
-        project_positions = obj.project_positions.all()
-        return [position_project.get_project_access_weight_display() for position_project in project_positions]
+        project_positions = getattr(obj, 'current_project_positions', None)
+        if project_positions is None:
+            project_positions = obj.project_positions.all()
+        return [
+            get_choice_display(ProjectPosition.WeightChoices, position_project.project_access_weight)
+            for position_project in project_positions
+        ]
 
     def get_access_weight(self, obj):
-        return obj.get_access_weight_display()
+        return get_choice_display(Position.WeightChoices, obj.access_weight)
 
 
 class DepartmentSerializer(UserHandlingMixin, serializers.ModelSerializer):
@@ -104,18 +115,42 @@ class DepartmentSerializer(UserHandlingMixin, serializers.ModelSerializer):
         model = Department
         fields = ('id', 'company', 'title', 'description', 'parent', 'users', 'color', 'is_remove', 'owner')
 
+    def validate_parent(self, parent):
+        if parent and self.instance and parent.path.startswith(self.instance.path):
+            raise serializers.ValidationError('Department can not be moved into its own subtree')
+        return parent
+
 
-class DepartmentNoUsersSerializer(serializers.ModelSerializer):
+class DepartmentNoUsersSerializer(FastRepresentationMixin, serializers.ModelSerializer):
 
     class Meta:
         model = Department
         fields = ('id', 'title', 'description', 'parent', 'company', 'color', 'owner')
 
 
+class DepartmentTreeSerializer(DepartmentNoUsersSerializer):
+    children = serializers.SerializerMethodField()
+
+    class Meta(DepartmentNoUsersSerializer.Meta):
+        fields = DepartmentNoUsersSerializer.Meta.fields + ('children', )
+
+    def get_children(self, obj):
+        return DepartmentTreeSerializer(self.context['children'].get(obj.id, []), many=True, context=self.context).data
+
+
 class DepartmentTitleIdSerializer(serializers.ModelSerializer):
     class Meta:
         model = Department
-        exclude = ('id', 'title')
+        fields = ('id', 'title')
+
+
+class ProjectListSerializer(serializers.ListSerializer):
+
+    def to_representation(self, data):
+        projects = list(data.all() if hasattr(data, 'all') else data)
+        self.context['positions_by_project'] = ProjectSerializer.get_positions_by_project(
+            [project.id for project in projects])
+        return super().to_representation(projects)
 
 
 class ProjectSerializer(UserHandlingMixin, serializers.ModelSerializer):
@@ -131,10 +166,49 @@ class ProjectSerializer(UserHandlingMixin, serializers.ModelSerializer):
                   'departments', 'color', 'priority',
                   'creation_date', 'date_of_update',
                   'is_remove', 'owner')
+        list_serializer_class = ProjectListSerializer
+
+    @staticmethod
+    def get_positions_by_project(project_ids):
+        # every project carries all company positions, so each position is rendered once
+        # and only its weights in the project are added per project
+        project_positions = ProjectPosition.objects.filter(project_id__in=project_ids).order_by(
+            'position__access_weight', 'position_id', 'id').values_list(
+            'project_id', 'position_id', 'position__title', 'position__access_weight', 'project_access_weight')
+        weight_labels = {
+            weight: get_choice_display(ProjectPosition.WeightChoices, weight)
+            for weight in ProjectPosition.WeightChoices.values
+        }
+        serializer = PositionForProjectSerializer()
+        rendered, weights_by_project = {}, {}
+        for project_id, position_id, title, access_weight, project_access_weight in project_positions:
+            if position_id not in rendered:
+                position = Position(id=position_id, title=title, access_weight=access_weight)
+                position.current_project_positions = []
+                rendered[position_id] = serializer.to_representation(position)
+            weights = weights_by_project.setdefault(project_id, {}).setdefault(position_id, [])
+            weights.append(weight_labels.get(project_access_weight, project_access_weight))
+        return {
+            project_id: [
+                {**rendered[position_id], 'project_positions': weights} for position_id, weights in positions.items()
+            ]
+            for project_id, positions in weights_by_project.items()
+        }
 
     def get_positions(self, obj):
-        positions_project = obj.positions.all()
-        return PositionForProjectSerializer(positions_project, many=True).data
+        positions_by_project = self.context.get('positions_by_project')
+        if positions_by_project is not None:
+            return positions_by_project.get(obj.id, [])
+        project_positions = ProjectPosition.objects.filter(project=obj).select_related('position').only(
+            'project_access_weight', 'position__id', 'position__title', 'position__access_weight'
+        ).order_by('position__access_weight', 'position_id', 'id')
+        positions = {}
+        for project_position in project_positions:
+            if project_position.position_id not in positions:
+                positions[project_position.position_id] = project_position.position
+                project_position.position.current_project_positions = []
+            positions[project_position.position_id].current_project_positions.append(project_position)
+        return PositionForProjectSerializer(list(positions.values()), many=True).data
 
     def to_internal_value(self, data):
         result = super().to_internal_value(data)
@@ -148,7 +222,7 @@ class ProjectSerializer(UserHandlingMixin, serializers.ModelSerializer):
         departments_ids = [department['id'] for department in validated_data.pop('departments', [])]
         departments = Department.objects.filter(id__in=departments_ids)
         instance = super().update(instance, validated_data)
-        instance.departments.add(*(set(departments) - set(instance.departments.all())))
+        instance.departments.add(*departments)
         return instance
 
 
@@ -161,6 +235,74 @@ class ProjectPostSerializer(UserHandlingMixin, serializers.ModelSerializer):
         fields = ('id', 'company', 'title', 'description', 'users', 'is_remove')
 
 
+class ProjectAccessSerializer(serializers.ModelSerializer):
+    access_weight = serializers.CharField(source='get_access_weight_display')
+
+    class Meta:
+        model = ProjectAccess
+        fields = ('user', 'project', 'access_weight')
+
+
+class ChangeLogSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ChangeLog
+        fields = ('id', 'sequence', 'company_id', 'model', 'object_id', 'action', 'relation', 'related_ids',
+                  'created_at')
+
+
+class ChangeFeedSerializer(serializers.Serializer):
+    next_since = serializers.IntegerField()
+    has_more = serializers.BooleanField()
+    results = ChangeLogSerializer(many=True)
+
+
+class BulkMembershipSerializer(serializers.Serializer):
+    emails = serializers.ListField(
+        child=serializers.EmailField(), allow_empty=False,
+        max_length=settings.BULK_MEMBERSHIP_MAX_EMAILS
+    )
+    is_remove = serializers.BooleanField(required=False, default=False)
+
+
+class BulkMembershipReportSerializer(serializers.Serializer):
+    added = serializers.IntegerField()
+    removed = serializers.IntegerField()
+    unchanged = serializers.IntegerField()
+    invited = serializers.IntegerField()
+    not_found = serializers.IntegerField()
+
+
+class UserImportUploadSerializer(serializers.Serializer):
+    file = serializers.FileField()
+    format = serializers.ChoiceField(choices=('csv', 'jsonl'), required=False)
+
+
+class UserImportSerializer(serializers.ModelSerializer):
+    chunks = serializers.SerializerMethodField()
+
+    class Meta:
+        model = UserImport
+        fields = (
+            'id', 'company', 'status', 'is_parsed', 'total_rows', 'processed_rows', 'failed_rows',
+            'queued_chunks', 'chunks', 'created_users', 'added_users', 'errors', 'created_at', 'finished_at'
+        )
+        read_only_fields = fields
+
+    def get_chunks(self, obj):
+        if obj.status != UserImport.Status.RUNNING or not obj.queued_chunks:
+            return {}
+        return get_import_chunk_states(obj)
+
+
+class ProjectImportSerializer(ProjectPostSerializer):
+    users = UserSerializer(many=True, required=False)
+    departments = serializers.ListField(child=serializers.IntegerField(), required=False)
+
+    class Meta:
+        model = Project
+        fields = ('id', 'title', 'description', 'users', 'departments', 'color', 'priority', 'owner')
+
+
 class LinkNoModelSerializer(serializers.Serializer):
     id = serializers.IntegerField()
     title = serializers.CharField()
@@ -0,0 +1,238 @@
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Case, F, Min, Q, When
+from django.db.models.signals import m2m_changed
+from django.utils import timezone
+
+from rest_framework.exceptions import ValidationError
+
+from company.cache import bump_company_version
+from company.changes import record_change, record_changes
+from company.models import Company, Position, Project, ProjectPosition, ProjectAccess, Department
+from company.tasks import notify_users_created
+from jwt_registration.models import User
+
+
+@transaction.atomic
+def provision_company(validated_data, emails):
+    emails = list(dict.fromkeys(emails))
+    owner_email = emails[0] if emails else None
+    if owner_email and Position.objects.filter(
+            company__title=validated_data.get('title'), company__users__email=owner_email,
+            access_weight=Position.WeightChoices.OWNER).exists():
+        raise ValidationError({'error': 'data_update is required'})
+
+    users = dict(User.objects.filter(email__in=emails).values_list('email', 'id'))
+    invited = [email for email in emails if email not in users]
+    if invited:
+        User.objects.bulk_create([User(email=email, is_registered=False) for email in invited])
+        users.update(User.objects.filter(email__in=invited).values_list('email', 'id'))
+        transaction.on_commit(lambda: notify_users_created.delay(invited))
+
+    company = Company.objects.create(**validated_data)
+    Company.users.through.objects.bulk_create(
+        [Company.users.through(company_id=company.id, user_id=user_id) for user_id in users.values()])
+    record_change(company.id, 'company', company.id, 'add', 'user', users.values())
+    if owner_email:
+        position = Position.objects.create(company=company)
+        Position.users.through.objects.bulk_create(
+            [Position.users.through(position_id=position.id, user_id=users[owner_email])])
+        record_change(company.id, 'position', position.id, 'add', 'user', [users[owner_email]])
+    return company
+
+
+@transaction.atomic
+def bulk_update_members(instance, emails, is_remove=False, invite=False):
+    emails = set(emails)
+    manager = instance.users
+    through = manager.through
+    source_field = f'{manager.source_field_name}_id'
+    target_field = f'{manager.target_field_name}_id'
+
+    users = dict(User.objects.filter(email__in=emails).values_list('email', 'id'))
+    invited = emails - users.keys() if invite and not is_remove else set()
+    if invited:
+        User.objects.bulk_create([User(email=email, is_registered=False) for email in invited])
+        users.update(User.objects.filter(email__in=invited).values_list('email', 'id'))
+        transaction.on_commit(lambda: notify_users_created.delay(list(invited)))
+
+    user_ids = set(users.values())
+    members = through.objects.filter(**{source_field: instance.pk, f'{target_field}__in': user_ids})
+    report = {'added': 0, 'removed': 0, 'unchanged': 0, 'invited': len(invited), 'not_found': len(emails) - len(users)}
+
+    if is_remove:
+        removed_ids = set(members.values_list(target_field, flat=True))
+        members.delete()
+        report['removed'] = len(removed_ids)
+        report['unchanged'] = len(user_ids) - len(removed_ids)
+        _send_m2m_changed(instance, 'post_remove', removed_ids)
+    else:
+        added_ids = user_ids - set(members.values_list(target_field, flat=True))
+        through.objects.bulk_create(
+            [through(**{source_field: instance.pk, target_field: user_id}) for user_id in added_ids],
+            ignore_conflicts=True
+        )
+        report['added'] = len(added_ids)
+        report['unchanged'] = len(user_ids) - len(added_ids)
+        _send_m2m_changed(instance, 'post_add', added_ids)
+    return report
+
+
+@transaction.atomic
+def import_users(company_id, rows):
+    emails = list(dict.fromkeys(email for _, email, _, _ in rows))
+    users = dict(User.objects.filter(email__in=emails).values_list('email', 'id'))
+    invited = [email for email in emails if email not in users]
+    created = _create_invited_users(invited) if invited else []
+    if invited:
+        users.update(User.objects.filter(email__in=invited).values_list('email', 'id'))
+    if created:
+        transaction.on_commit(lambda: notify_users_created.delay(created))
+
+    added_ids = _add_missing_members(Company.users.through, 'company_id', company_id, users.values())
+    if added_ids:
+        # the company signals would make an imported user owner of a company without positions
+        bump_company_version(company_id)
+        Company.objects.filter(id=company_id).update(updated_at=timezone.now())
+        record_change(company_id, 'company', company_id, 'add', 'user', added_ids)
+
+    for model, column in ((Position, 2), (Department, 3)):
+        members = {}
+        for row in rows:
+            if row[column] is not None and row[1] in users:
+                members.setdefault(row[column], set()).add(users[row[1]])
+        for instance in model.objects.filter(company=company_id, id__in=members):
+            _send_m2m_changed(instance, 'post_add', _add_missing_members(
+                model.users.through, f'{model._meta.model_name}_id', instance.id, members[instance.id]))
+    return {'created_users': len(created), 'added_users': len(added_ids)}
+
+
+def _create_invited_users(emails):
+    try:
+        with transaction.atomic():
+            User.objects.bulk_create([User(email=email, is_registered=False) for email in emails])
+        return emails
+    except IntegrityError:
+        pass
+    # some of them were inserted concurrently, only the rows created here are reported and invited
+    created = []
+    for email in emails:
+        try:
+            with transaction.atomic():
+                User.objects.create(email=email, is_registered=False)
+        except IntegrityError:
+            continue
+        created.append(email)
+    return created
+
+
+def _add_missing_members(through, source_field, source_id, user_ids):
+    existing = set(through.objects.filter(**{source_field: source_id, 'user_id__in': user_ids}).values_list(
+        'user_id', flat=True))
+    added_ids = [user_id for user_id in dict.fromkeys(user_ids) if user_id not in existing]
+    through.objects.bulk_create(
+        [through(**{source_field: source_id, 'user_id': user_id}) for user_id in added_ids], ignore_conflicts=True)
+    return added_ids
+
+
+def _send_m2m_changed(instance, action, pk_set):
+    if pk_set:
+        m2m_changed.send(
+            sender=instance.users.through, instance=instance, action=action,
+            reverse=False, model=User, pk_set=pk_set, using=instance._state.db
+        )
+
+
+def get_effective_access_weight():
+    # a project weight of STANDARD keeps the position weight, owners keep full access everywhere
+    return Case(
+        When(
+            Q(position__access_weight=Position.WeightChoices.OWNER)
+            | Q(project_access_weight=ProjectPosition.WeightChoices.STANDARD),
+            then=F('position__access_weight')
+        ),
+        default=F('project_access_weight'),
+    )
+
+
+@transaction.atomic
+def rebuild_project_access(user_ids=None, project_ids=None):
+    if (user_ids is not None and not user_ids) or (project_ids is not None and not project_ids):
+        return
+    scope = Q()
+    # one filter() call so position__users is joined once, chained calls add a join per call
+    source = {'position__users__isnull': False}
+    if user_ids is not None:
+        scope &= Q(user_id__in=user_ids)
+        source = {'position__users__in': user_ids}
+    if project_ids is not None:
+        scope &= Q(project_id__in=project_ids)
+        source['project_id__in'] = project_ids
+
+    rows = ProjectPosition.objects.filter(**source).order_by().values_list('position__users', 'project_id').annotate(
+        weight=Min(get_effective_access_weight()))
+    ProjectAccess.objects.filter(scope).delete()
+    _insert_from_select(ProjectAccess, ('user', 'project', 'access_weight'), rows)
+
+
+def _insert_from_select(model, fields, queryset):
+    # a position can give access to thousands of projects, INSERT ... SELECT keeps those rows in the database
+    sql, params = queryset.query.sql_with_params()
+    quote_name = connection.ops.quote_name
+    columns = ', '.join(quote_name(model._meta.get_field(field).column) for field in fields)
+    with connection.cursor() as cursor:
+        cursor.execute(f'INSERT INTO {quote_name(model._meta.db_table)} ({columns}) {sql}', params)
+
+
+def create_project_access(projects):
+    # new projects get a STANDARD ProjectPosition for every company position, so the
+    # effective weight is the position weight and does not depend on those rows existing yet
+    company_ids = {project.company_id for project in projects}
+    rows = Position.objects.filter(company__in=company_ids, users__isnull=False).values(
+        'company_id', 'users').annotate(weight=Min('access_weight'))
+    ProjectAccess.objects.bulk_create([
+        ProjectAccess(user_id=row['users'], project_id=project.id, access_weight=row['weight'])
+        for project in projects for row in rows if row['company_id'] == project.company_id
+    ])
+
+
+@transaction.atomic
+def bulk_create_projects(company_id, projects_data):
+    projects = Project.objects.bulk_create([
+        Project(company_id=company_id, **{
+            field: value for field, value in project_data.items()
+            if field not in ('users', 'departments', 'is_remove')
+        })
+        for project_data in projects_data
+    ])
+
+    position_ids = list(Position.objects.filter(company=company_id).values_list('id', flat=True))
+    ProjectPosition.objects.bulk_create([
+        ProjectPosition(project_id=project.id, position_id=position_id)
+        for project in projects for position_id in position_ids
+    ])
+
+    emails = {user['email'] for project_data in projects_data for user in project_data.get('users', [])}
+    users = dict(User.objects.filter(email__in=emails).values_list('email', 'id'))
+    Project.users.through.objects.bulk_create([
+        Project.users.through(project_id=project.id, user_id=users[user['email']])
+        for project, project_data in zip(projects, projects_data)
+        for user in project_data.get('users', []) if user['email'] in users
+    ], ignore_conflicts=True)
+
+    department_ids = {
+        department_id for project_data in projects_data for department_id in project_data.get('departments', [])}
+    department_ids = set(Department.objects.filter(
+        company=company_id, id__in=department_ids).values_list('id', flat=True))
+    Project.departments.through.objects.bulk_create([
+        Project.departments.through(project_id=project.id, department_id=department_id)
+        for project, project_data in zip(projects, projects_data)
+        for department_id in project_data.get('departments', []) if department_id in department_ids
+    ], ignore_conflicts=True)
+
+    create_project_access(projects)
+    bump_company_version(company_id)
+    record_changes([
+        {'company_id': company_id, 'model': 'project', 'object_id': project.id, 'action': 'create'}
+        for project in projects
+    ])
+    return projects
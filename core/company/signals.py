@@ -1,6 +1,14 @@
-from django.db.models.signals import m2m_changed, post_save
+from weakref import WeakSet
+
+from django.db.models.signals import m2m_changed, post_save, post_delete, pre_delete, pre_save
 from django.dispatch import receiver
-from company.models import Company, Position, Project, ProjectPosition
+from company.cache import bump_company_version
+from company.services import rebuild_project_access, create_project_access
+from company.changes import record_change, record_changes, record_membership_removals
+from django.db.models import QuerySet, Value
+from django.utils import timezone
+from django.db.models.functions import Concat, Substr
+from company.models import Company, Position, Project, ProjectPosition, Department, ChangeLog
 from rest_framework.exceptions import ValidationError
 
 from jwt_registration.models import User
@@ -8,24 +16,19 @@ from jwt_registration.models import User
 
 @receiver(m2m_changed, sender=Company.users.through)
 def create_company_position(instance, action, **kwargs):
-    user_creator_id = list(kwargs.get('pk_set', []))[0]
+    if action not in ('pre_add', 'post_add') or kwargs.get('reverse') or not kwargs.get('pk_set'):
+        return
+    user_creator_id = list(kwargs['pk_set'])[0]
     if action == 'pre_add':
-        creator = User.objects.get(id=user_creator_id)
         creators_company_with_same_title = Company.objects.filter(
-            title=instance.title, users=creator).exclude(id=instance.id)
-        creators_positions_list = Position.objects.filter(
-            company__in=creators_company_with_same_title).values_list('access_weight')
-        if (0,) in creators_positions_list:
+            title=instance.title, users=user_creator_id).exclude(id=instance.id)
+        if Position.objects.filter(company__in=creators_company_with_same_title, access_weight=0).exists():
             instance.delete()
             raise ValidationError({'error': 'data_update is required'})
     if action == 'post_add':
-        user_creator_id = list(kwargs.get('pk_set', []))[0]
-        creator = User.objects.get(id=user_creator_id)
-        if user_creator_id:
-            position = Position.objects.filter(company=instance).first()
-            if position is None:
-                position = Position.objects.create(company=instance)
-                position.users.add(user_creator_id)
+        if not Position.objects.filter(company=instance).exists():
+            position = Position.objects.create(company=instance)
+            position.users.add(user_creator_id)
 
 
 @receiver(post_save, sender=Project)
@@ -38,3 +41,270 @@ def create_project_position(sender, instance, created, **kwargs):
         ]
 
         ProjectPosition.objects.bulk_create(project_positions)
+
+
+@receiver(post_save, sender=Department)
+def update_department_path(instance, **kwargs):
+    parent_path = ''
+    if instance.parent_id:
+        parent_path = Department.objects.filter(id=instance.parent_id).values_list('path', flat=True).first()
+    path = f'{parent_path}{instance.id}/'
+    if instance.path == path:
+        return
+    if instance.path:
+        Department.objects.filter(path__startswith=instance.path).update(
+            path=Concat(Value(path), Substr('path', len(instance.path) + 1)))
+    else:
+        Department.objects.filter(id=instance.id).update(path=path)
+    instance.path = path
+
+
+@receiver(m2m_changed, sender=Company.users.through)
+def invalidate_company_members(instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    if not reverse:
+        bump_company_version(instance.id)
+        Company.objects.filter(id=instance.id).update(updated_at=timezone.now())
+    elif action == 'pre_clear':
+        bump_company_version(*instance.companies.values_list('id', flat=True))
+    elif pk_set:
+        bump_company_version(*pk_set)
+        Company.objects.filter(id__in=pk_set).update(updated_at=timezone.now())
+
+
+@receiver(post_save, sender=Company)
+@receiver(post_delete, sender=Company)
+def invalidate_company(instance, **kwargs):
+    bump_company_version(instance.id)
+
+
+def get_saved_values(instance, fields, update_fields=None):
+    if instance._state.adding or (update_fields is not None and not set(fields) & set(update_fields)):
+        return None
+    return type(instance).objects.filter(pk=instance.pk).values(*fields).first()
+
+
+def has_changed(instance, *fields):
+    saved = getattr(instance, '_saved_values', None)
+    return saved is not None and any(saved[field] != getattr(instance, field) for field in fields)
+
+
+def invalidate_users(users):
+    # projects embed their users, so their conditional GET validators have to move too
+    projects = Project.objects.filter(users__in=users)
+    company_ids = set(Company.objects.filter(users__in=users).values_list('id', flat=True))
+    company_ids.update(projects.values_list('company_id', flat=True))
+    if company_ids:
+        bump_company_version(*company_ids)
+        projects.update(updated_at=timezone.now())
+
+
+# a queryset delete sends pre_delete for every user, the first one handles all of them
+_handled_user_deletes = WeakSet()
+
+
+@receiver(pre_save, sender=User)
+def remember_user_email(instance, update_fields=None, **kwargs):
+    instance._saved_values = get_saved_values(instance, ('email',), update_fields)
+
+
+@receiver(post_save, sender=User)
+def invalidate_user_companies(instance, created, **kwargs):
+    # only the email is rendered in company and project payloads, a login touching last_login is not
+    if not created and has_changed(instance, 'email'):
+        invalidate_users([instance.pk])
+
+
+@receiver(pre_delete, sender=User)
+def handle_deleted_users(instance, origin=None, **kwargs):
+    users = [instance.pk]
+    if isinstance(origin, QuerySet) and origin.model is User:
+        if origin in _handled_user_deletes:
+            return
+        _handled_user_deletes.add(origin)
+        users = origin.values('pk')
+    invalidate_users(users)
+    record_membership_removals(users)
+
+
+@receiver(post_save, sender=Position)
+@receiver(post_delete, sender=Position)
+@receiver(post_save, sender=Project)
+@receiver(post_delete, sender=Project)
+@receiver(post_save, sender=Department)
+@receiver(post_delete, sender=Department)
+def invalidate_company_resource(instance, **kwargs):
+    bump_company_version(instance.company_id)
+
+
+def is_cascade_delete(sender, origin):
+    origin_model = origin.model if isinstance(origin, QuerySet) else type(origin)
+    return origin_model is not sender
+
+
+@receiver(post_save, sender=ProjectPosition)
+@receiver(post_delete, sender=ProjectPosition)
+def invalidate_project_position(sender, instance, **kwargs):
+    if is_cascade_delete(sender, kwargs.get('origin', instance)):
+        return
+    company_id = Project.objects.filter(id=instance.project_id).values_list('company_id', flat=True).first()
+    if company_id:
+        bump_company_version(company_id)
+        Project.objects.filter(id=instance.project_id).update(updated_at=timezone.now())
+
+
+@receiver(pre_save, sender=Position)
+def remember_saved_position(instance, update_fields=None, **kwargs):
+    instance._saved_values = get_saved_values(instance, ('title', 'access_weight'), update_fields)
+
+
+@receiver(post_save, sender=Position)
+def touch_position_projects(instance, created, **kwargs):
+    if not created and has_changed(instance, 'title', 'access_weight'):
+        Project.objects.filter(position_projects__position=instance).update(updated_at=timezone.now())
+
+
+@receiver(pre_save, sender=Department)
+def remember_saved_department(instance, update_fields=None, **kwargs):
+    instance._saved_values = get_saved_values(instance, ('title',), update_fields)
+
+
+@receiver(post_save, sender=Department)
+def touch_department_projects(instance, created, **kwargs):
+    if not created and has_changed(instance, 'title'):
+        Project.objects.filter(departments=instance).update(updated_at=timezone.now())
+
+
+@receiver(pre_delete, sender=Department)
+def touch_deleted_department_projects(instance, **kwargs):
+    Project.objects.filter(departments=instance).update(updated_at=timezone.now())
+
+
+@receiver(m2m_changed, sender=Position.users.through)
+@receiver(m2m_changed, sender=Position.projects.through)
+@receiver(m2m_changed, sender=Project.users.through)
+@receiver(m2m_changed, sender=Project.departments.through)
+@receiver(m2m_changed, sender=Department.users.through)
+def invalidate_company_relation(instance, action, model, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    if hasattr(instance, 'company_id'):
+        bump_company_version(instance.company_id)
+        type(instance).objects.filter(pk=instance.pk).update(updated_at=timezone.now())
+        if pk_set and model is Project:
+            Project.objects.filter(pk__in=pk_set).update(updated_at=timezone.now())
+    elif pk_set:
+        bump_company_version(*model.objects.filter(pk__in=pk_set).values_list('company_id', flat=True).distinct())
+        model.objects.filter(pk__in=pk_set).update(updated_at=timezone.now())
+    else:
+        bump_company_version(*instance.companies.values_list('id', flat=True))
+
+
+@receiver(post_save, sender=Project)
+def create_new_project_access(instance, created, **kwargs):
+    if created:
+        create_project_access([instance])
+
+
+@receiver(post_save, sender=Position)
+def update_position_project_access(instance, created, **kwargs):
+    if not created and has_changed(instance, 'access_weight'):
+        rebuild_project_access(user_ids=list(instance.users.values_list('id', flat=True)))
+
+
+@receiver(pre_delete, sender=Position)
+def remember_deleted_position_access(sender, instance, **kwargs):
+    instance._access_user_ids = instance._access_project_ids = []
+    if not is_cascade_delete(sender, kwargs.get('origin', instance)):
+        instance._access_user_ids = list(instance.users.values_list('id', flat=True))
+        instance._access_project_ids = list(instance.project_positions.values_list('project_id', flat=True))
+
+
+@receiver(post_delete, sender=Position)
+def update_deleted_position_access(instance, **kwargs):
+    if instance._access_project_ids:
+        Project.objects.filter(id__in=instance._access_project_ids).update(updated_at=timezone.now())
+    if instance._access_user_ids:
+        rebuild_project_access(user_ids=instance._access_user_ids)
+
+
+@receiver(post_save, sender=ProjectPosition)
+@receiver(post_delete, sender=ProjectPosition)
+def update_project_position_access(sender, instance, **kwargs):
+    # rows removed with their project or position are handled once by that delete
+    if not is_cascade_delete(sender, kwargs.get('origin', instance)):
+        rebuild_project_access(project_ids=[instance.project_id])
+
+
+@receiver(m2m_changed, sender=Position.users.through)
+def update_position_users_access(instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if reverse:
+        rebuild_project_access(user_ids=[instance.id])
+    elif action == 'post_clear':
+        rebuild_project_access(project_ids=list(instance.project_positions.values_list('project_id', flat=True)))
+    else:
+        rebuild_project_access(user_ids=pk_set)
+
+
+@receiver(m2m_changed, sender=Position.projects.through)
+def update_position_projects_access(instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if reverse:
+        rebuild_project_access(project_ids=[instance.id])
+    else:
+        rebuild_project_access(user_ids=list(instance.users.values_list('id', flat=True)))
+
+
+@receiver(post_save, sender=Company)
+@receiver(post_save, sender=Position)
+@receiver(post_save, sender=Project)
+@receiver(post_save, sender=Department)
+def record_company_resource_save(instance, created, **kwargs):
+    action = ChangeLog.Action.CREATE if created else ChangeLog.Action.UPDATE
+    company_id = instance.id if isinstance(instance, Company) else instance.company_id
+    record_change(company_id, instance._meta.model_name, instance.id, action)
+
+
+@receiver(post_delete, sender=Company)
+@receiver(post_delete, sender=Position)
+@receiver(post_delete, sender=Project)
+@receiver(post_delete, sender=Department)
+def record_company_resource_delete(instance, **kwargs):
+    company_id = instance.id if isinstance(instance, Company) else instance.company_id
+    record_change(company_id, instance._meta.model_name, instance.id, ChangeLog.Action.DELETE)
+
+
+@receiver(m2m_changed, sender=Company.users.through)
+@receiver(m2m_changed, sender=Position.users.through)
+@receiver(m2m_changed, sender=Position.projects.through)
+@receiver(m2m_changed, sender=Project.users.through)
+@receiver(m2m_changed, sender=Project.departments.through)
+@receiver(m2m_changed, sender=Department.users.through)
+def record_company_relation(sender, instance, action, reverse, model, pk_set, **kwargs):
+    if reverse and action == 'pre_clear':
+        # a reverse clear() reports no pk_set, so the objects losing the relation are read first
+        field = next(field for field in model._meta.many_to_many if field.remote_field.through is sender)
+        instance._cleared_ids = set(model.objects.filter(**{field.name: instance}).values_list('pk', flat=True))
+        return
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    change_action = action.removeprefix('post_')
+    if reverse and action == 'post_clear':
+        change_action, pk_set = ChangeLog.Action.REMOVE, instance._cleared_ids
+    if not reverse:
+        relation = model._meta.model_name
+        company_id = instance.id if isinstance(instance, Company) else instance.company_id
+        record_change(company_id, instance._meta.model_name, instance.id, change_action, relation, pk_set)
+    elif pk_set:
+        company_field = 'id' if model is Company else 'company_id'
+        record_changes([
+            {
+                'company_id': company_id, 'model': model._meta.model_name, 'object_id': object_id,
+                'action': change_action, 'relation': instance._meta.model_name, 'related_ids': [instance.id],
+            }
+            for object_id, company_id in model.objects.filter(pk__in=pk_set).values_list('id', company_field)
+        ])
@@ -1,3 +1,4 @@
+from django.core.cache import cache
 from rest_framework.test import APITestCase, APIRequestFactory, APIClient
 
 from company.models import Company, Position, Department
@@ -6,6 +7,11 @@ from jwt_registration.models import User
 
 class BaseAPITestCase(APITestCase):
 
+    def _pre_setup(self):
+        super()._pre_setup()
+        # company versions are bumped on commit, which never happens inside a test case
+        cache.clear()
+
     @classmethod
     def setUpClass(cls):
         super().setUpClass()
@@ -0,0 +1,67 @@
+from django.core.cache import cache
+from django.test import TestCase
+
+from company.benchmark import (
+    seed_benchmark_company, get_benchmark_fixture, get_uncovered_routes, run_benchmark, build_budget, check_budget,
+    run_serializer_benchmark, )
+from company.models import Department, ProjectAccess, ProjectPosition
+
+
+class BenchmarkTestCase(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.company = seed_benchmark_company(
+            users=20, positions=3, projects=4, department_depth=3, department_children=2,
+            users_per_position=2, users_per_department=2, users_per_project=2
+        )
+        self.fixture = get_benchmark_fixture()
+
+    def test_seed_builds_consistent_data(self):
+        self.assertEqual(self.company.users.count(), 20)
+        self.assertEqual(ProjectPosition.objects.filter(project__company=self.company).count(), 12)
+        self.assertTrue(ProjectAccess.objects.filter(project__company=self.company).exists())
+        deepest = Department.objects.get(id=self.fixture['department_id'])
+        self.assertEqual(len(deepest.get_ancestor_ids()), 2)
+
+    def test_every_route_has_a_scenario(self):
+        self.assertEqual(get_uncovered_routes(self.fixture), [])
+
+    def test_run_benchmark_and_budget(self):
+        results = run_benchmark(iterations=1, fixture=self.fixture)
+
+        self.assertFalse([name for name, metrics in results.items() if max(metrics['status']) >= 500])
+        budget = build_budget(results)
+        self.assertEqual(check_budget(results, budget), [])
+
+        budget['company-detail GET']['queries'] = results['company-detail GET']['queries'] - 1
+        del budget['company-list GET']
+        violations = check_budget(results, budget)
+        self.assertEqual(len(violations), 2)
+        self.assertIn('company-detail GET: queries', violations[0])
+
+    def test_latency_budget_is_relative_to_reference_route(self):
+        results = {
+            'user-detail GET': {'queries': 1, 'p50_ms': 4.0, 'p95_ms': 5.0, 'peak_kb': 10, 'status': [200]},
+            'company-list GET': {'queries': 3, 'p50_ms': 30.0, 'p95_ms': 40.0, 'peak_kb': 50, 'status': [200]},
+        }
+        budget = build_budget(results)
+        self.assertEqual(budget['company-list GET']['latency_ratio'], 10.0)
+
+        slower_machine = {
+            name: {**metrics, 'p50_ms': metrics['p50_ms'] * 3, 'p95_ms': metrics['p95_ms'] * 3}
+            for name, metrics in results.items()
+        }
+        self.assertEqual(check_budget(slower_machine, budget), [])
+
+        results['company-list GET']['p95_ms'] = 100.0
+        violations = check_budget(results, budget, tolerance=2)
+        self.assertEqual(violations, ['company-list GET: latency_ratio 25.0 > 10.0 x 2'])
+
+
+class SerializerBenchmarkTestCase(TestCase):
+
+    def test_fast_representation_is_identical(self):
+        results = run_serializer_benchmark(rows=50)
+        self.assertEqual(len(results), 4)
+        self.assertTrue(all(metrics['identical'] for metrics in results.values()))
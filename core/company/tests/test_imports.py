@@ -0,0 +1,149 @@
+import io
+import json
+import os
+import tempfile
+from unittest.mock import patch
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import override_settings
+from django.urls import reverse
+
+from company.imports import apply_import_chunk, get_import_chunk_states, read_import_rows, run_user_import
+from company.models import Company, UserImport, UserImportChunk
+from company.serializers import UserImportSerializer
+from company.services import _create_invited_users
+from jwt_registration.models import User
+from .test_base import BaseAPITestCase
+
+
+class UserImportTestCase(BaseAPITestCase):
+
+    def setUp(self):
+        self.csv = (
+            'Email,Position,Department\n'
+            'new_1@gmail.com,test_position_title_1,\n'
+            f'new_2@gmail.com,,{self.department.id}\n'
+            'test_email_1@gmail.com,,\n'
+            'broken,,\n'
+            'new_3@gmail.com,missing position,\n'
+        )
+
+    def run_csv_import(self, content, asynchronous=False):
+        user_import = UserImport.objects.create(company=self.company)
+        return run_user_import(user_import, read_import_rows(io.StringIO(content), 'csv'), asynchronous=asynchronous)
+
+    @override_settings(USER_IMPORT_CHUNK_SIZE=2)
+    def test_csv_import(self):
+        user_import = self.run_csv_import(self.csv)
+
+        self.assertEqual(user_import.status, UserImport.Status.DONE)
+        self.assertEqual(
+            (user_import.total_rows, user_import.processed_rows, user_import.failed_rows,
+             user_import.created_users, user_import.added_users),
+            (5, 3, 2, 2, 2)
+        )
+        self.assertEqual(user_import.errors, [
+            {'line': 5, 'error': 'invalid email'}, {'line': 6, 'error': 'unknown position'}])
+        self.assertFalse(User.objects.get(email='new_1@gmail.com').is_registered)
+        self.assertTrue(self.company.users.filter(email='new_2@gmail.com').exists())
+        self.assertTrue(self.position.users.filter(email='new_1@gmail.com').exists())
+        self.assertTrue(self.department.users.filter(email='new_2@gmail.com').exists())
+
+    def test_import_is_idempotent(self):
+        self.run_csv_import(self.csv)
+        user_import = self.run_csv_import(self.csv)
+        self.assertEqual((user_import.created_users, user_import.added_users), (0, 0))
+        self.assertEqual(User.objects.filter(email__startswith='new_').count(), 2)
+
+    def test_invitations_are_queued_once_per_chunk(self):
+        with patch('company.services.notify_users_created.delay') as delay, \
+                self.captureOnCommitCallbacks(execute=True):
+            self.run_csv_import(self.csv)
+        delay.assert_called_once_with(['new_1@gmail.com', 'new_2@gmail.com'])
+
+    def test_async_import_reports_progress(self):
+        with patch('company.imports.import_users_chunk.apply_async') as apply_async, \
+                self.captureOnCommitCallbacks(execute=True):
+            user_import = self.run_csv_import(self.csv, asynchronous=True)
+        self.assertEqual(user_import.status, UserImport.Status.RUNNING)
+        self.assertEqual((user_import.processed_rows, user_import.queued_chunks), (0, 1))
+        self.assertEqual(apply_async.call_args.kwargs['task_id'], f'user-import-{user_import.id}-0')
+
+        with self.assertNumQueries(1):
+            self.assertEqual(UserImportSerializer(user_import).data['chunks'], {UserImportChunk.Status.QUEUED: 1})
+
+        (import_id, rows, index), = apply_async.call_args.args
+        apply_import_chunk(import_id, rows, index)
+        user_import.refresh_from_db()
+        self.assertEqual(user_import.status, UserImport.Status.DONE)
+        self.assertEqual(user_import.processed_rows, 3)
+        self.assertEqual(get_import_chunk_states(user_import), {UserImportChunk.Status.APPLIED: 1})
+
+    def test_redelivered_chunk_is_counted_once(self):
+        user_import = UserImport.objects.create(company=self.company, total_rows=4, is_parsed=True)
+        rows = [[2, 'new_1@gmail.com', None, None], [3, 'new_2@gmail.com', None, None]]
+        apply_import_chunk(user_import.id, rows, 0)
+        apply_import_chunk(user_import.id, rows, 0)
+        user_import.refresh_from_db()
+        self.assertEqual((user_import.processed_rows, user_import.created_users), (2, 2))
+        self.assertEqual(user_import.status, UserImport.Status.RUNNING)
+
+    def test_concurrently_created_users_are_not_reported(self):
+        # new_2 was registered between the lookup in import_users and the insert
+        User.objects.create(email='new_2@gmail.com')
+        self.assertEqual(_create_invited_users(['new_1@gmail.com', 'new_2@gmail.com']), ['new_1@gmail.com'])
+        self.assertFalse(User.objects.get(email='new_1@gmail.com').is_registered)
+
+    def test_failed_chunk_is_reported(self):
+        with patch('company.imports.import_users', side_effect=RuntimeError('db is gone')):
+            user_import = self.run_csv_import(self.csv)
+        self.assertEqual(user_import.status, UserImport.Status.DONE)
+        self.assertEqual(user_import.failed_rows, 5)
+        self.assertIn({'line': 2, 'error': 'import failed'}, user_import.errors)
+        self.assertEqual(list(get_import_chunk_states(user_import)), [UserImportChunk.Status.FAILED])
+
+    @override_settings(USER_IMPORT_ASYNC=False)
+    def test_jsonl_upload_and_progress(self):
+        content = '\n'.join(json.dumps(row) for row in (
+            {'email': 'json_1@gmail.com', 'position': self.position.id},
+            {'email': 'json_2@gmail.com'},
+            ['not', 'an', 'object'],
+        ))
+        response = self.client.post(
+            reverse('company-import-users', kwargs={'pk': self.company.id}),
+            {'file': SimpleUploadedFile('users.jsonl', content.encode())},
+            format='multipart'
+        )
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.data['status'], UserImport.Status.DONE)
+        self.assertEqual(response.data['errors'], [{'line': 3, 'error': 'invalid row'}])
+        self.assertTrue(self.position.users.filter(email='json_1@gmail.com').exists())
+
+        response = self.client.get(reverse('company-user-import', kwargs={
+            'pk': self.company.id, 'import_pk': response.data['id']}))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['processed_rows'], 2)
+
+        other_company = Company.objects.create(title='other_company')
+        response = self.client.get(reverse('company-user-import', kwargs={
+            'pk': other_company.id, 'import_pk': response.data['id']}))
+        self.assertEqual(response.status_code, 404)
+
+    def test_unreadable_upload_fails(self):
+        response = self.client.post(
+            reverse('company-import-users', kwargs={'pk': self.company.id}),
+            {'file': SimpleUploadedFile('users.csv', b'email\n\xff\xfe\n')},
+            format='multipart'
+        )
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.data['status'], UserImport.Status.FAILED)
+
+    def test_management_command(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False) as file:
+            file.write(self.csv)
+        self.addCleanup(os.remove, file.name)
+        stdout, stderr = io.StringIO(), io.StringIO()
+        call_command('import_users', self.company.id, file.name, stdout=stdout, stderr=stderr)
+        self.assertIn('done: 5 rows, 3 processed, 2 failed', stdout.getvalue())
+        self.assertIn('line 5: invalid email', stderr.getvalue())
@@ -0,0 +1,94 @@
+import io
+import json
+from contextlib import redirect_stdout
+from time import perf_counter
+
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+
+from company.tests.test_base import BaseAPITestCase
+from core.metrics import render_metrics
+from core.middleware import RequestMetricsMiddleware
+
+
+@override_settings(REQUEST_METRICS_LOG=True)
+class RequestMetricsMiddlewareTestCase(BaseAPITestCase):
+
+    def setUp(self):
+        self.stdout = io.StringIO()
+        redirect = redirect_stdout(self.stdout)
+        redirect.__enter__()
+        self.addCleanup(redirect.__exit__, None, None, None)
+
+    @property
+    def records(self):
+        return [
+            json.loads(line)['record']['extra']['request_metrics'] for line in self.stdout.getvalue().splitlines()
+        ]
+
+    def test_request_is_logged_with_metrics(self):
+        url = reverse('company-position-list', kwargs={'company_pk': self.company.id})
+        response = self.client.get(url)
+
+        record = self.records[-1]
+        self.assertEqual(record['view'], 'company-position-list')
+        self.assertEqual(record['company_id'], str(self.company.id))
+        self.assertEqual(record['status'], 200)
+        self.assertGreater(record['db_queries'], 0)
+        self.assertGreaterEqual(record['db_ms'], 0)
+        self.assertGreater(record['serialization_ms'], 0)
+        self.assertEqual(record['response_bytes'], len(response.content))
+
+    def test_company_id_for_company_routes(self):
+        self.client.get(reverse('company-detail', kwargs={'pk': self.company.id}))
+        self.assertEqual(self.records[-1]['company_id'], str(self.company.id))
+
+    @override_settings(REQUEST_METRICS_PROMETHEUS=True)
+    def test_metrics_endpoint(self):
+        self.client.get(reverse('company-list'))
+        response = self.client.get(reverse('metrics'))
+
+        self.assertEqual(response.status_code, 200)
+        content = response.content.decode()
+        self.assertIn('http_requests_total{view="company-list",method="GET",status="200"}', content)
+        self.assertIn('http_request_duration_seconds_bucket{view="company-list",method="GET",le="+Inf"}', content)
+
+    def test_metrics_endpoint_is_restricted(self):
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 404)
+        with override_settings(REQUEST_METRICS_PROMETHEUS=True):
+            response = self.client.get(reverse('metrics'), REMOTE_ADDR='203.0.113.7')
+        self.assertEqual(response.status_code, 404)
+
+    @override_settings(REQUEST_METRICS_LOG=False)
+    def test_metrics_without_log(self):
+        self.client.get(reverse('company-list'))
+        self.assertEqual(self.records, [])
+        self.assertIn('view="company-list"', render_metrics())
+
+
+@override_settings(REQUEST_METRICS_LOG=False)
+class RequestMetricsOverheadTestCase(TestCase):
+
+    def test_overhead_is_below_a_millisecond(self):
+        request_factory = RequestFactory()
+        response = HttpResponse('ok')
+
+        def bare(request):
+            return response
+
+        middleware = RequestMetricsMiddleware(bare)
+        requests = [request_factory.get('/') for _ in range(500)]
+        for request in requests:
+            request.resolver_match = None
+
+        started = perf_counter()
+        for request in requests:
+            bare(request)
+        baseline = perf_counter() - started
+        started = perf_counter()
+        for request in requests:
+            middleware(request)
+        overhead = (perf_counter() - started - baseline) / len(requests)
+
+        self.assertLess(overhead, 0.001)
@@ -1,3 +1,4 @@
+from django.db import IntegrityError, connection
 from django.test import TestCase
 from django.contrib.auth import get_user_model
 from company.models import Company, Position, Project, ProjectPosition, Department
@@ -152,11 +153,11 @@ class ProjectPositionTestCase(TestCase):
         self.position = Position.objects.create(**position_data)
         self.position.projects.add(self.project)
         self.position.users.add(self.user)
-        self.project_position = ProjectPosition.objects.create(
+        self.project_position = ProjectPosition.objects.update_or_create(
             position=self.position,
             project=self.project,
-            project_access_weight=ProjectPosition.WeightChoices.FULL_ACCESS
-        )
+            defaults={'project_access_weight': ProjectPosition.WeightChoices.FULL_ACCESS}
+        )[0]
 
     def test_str_method(self):
         expected_str = f"{self.position.title} - {self.project.title}"
@@ -215,4 +216,48 @@ class DepartmentTestCase(TestCase):
         self.assertEqual(Department._meta.verbose_name_plural, _("Departments"))
 
     def test_color(self):
-        self.assertIsNotNone(self.department.color)
\ No newline at end of file
+        self.assertIsNotNone(self.department.color)
+
+class QueryPlanTestCase(TestCase):
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(email='test_email@gmail.com')
+        self.company = Company.objects.create(title='test_company_1')
+        self.company.users.add(self.user)
+        self.department = Department.objects.create(title='test_department_1', company=self.company)
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('SET LOCAL enable_seqscan = off')
+
+    def assertUsesIndex(self, queryset, index_name):
+        self.assertIn(index_name, queryset.explain())
+
+    def test_positions_by_company_ordered_by_weight(self):
+        self.assertUsesIndex(
+            Position.objects.filter(company=self.company).order_by('access_weight'),
+            'position_company_weight_idx'
+        )
+
+    def test_company_by_title_and_user(self):
+        self.assertUsesIndex(
+            Company.objects.filter(title=self.company.title, users=self.user),
+            'company_title_idx'
+        )
+
+    def test_projects_by_company_ordered_by_title(self):
+        self.assertUsesIndex(
+            Project.objects.filter(company=self.company).order_by('title'),
+            'project_company_title_idx'
+        )
+
+    def test_departments_by_company_and_parent(self):
+        self.assertUsesIndex(
+            Department.objects.filter(company=self.company, parent=self.department),
+            'department_company_parent_idx'
+        )
+
+    def test_project_position_is_unique(self):
+        project = Project.objects.create(title='test_project_1', company=self.company)
+        position = Position.objects.filter(company=self.company).first()
+        with self.assertRaises(IntegrityError):
+            ProjectPosition.objects.create(position=position, project=project)
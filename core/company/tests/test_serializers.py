@@ -1,10 +1,15 @@
 from django.db.models.signals import m2m_changed, post_save
 from company.serializers import (
     CompanySerializer, PositionSerializer,
-    PositionForProjectSerializer, ProjectSerializer
+    PositionForProjectSerializer, ProjectSerializer,
+    DepartmentNoUsersSerializer, DepartmentTreeSerializer, ExternalAPIRequestPositionNoUsersSerializer,
 )
 from django.test import TestCase
+from django.utils import translation
+from rest_framework import serializers
+from rest_framework.renderers import JSONRenderer
 from jwt_registration.models import User
+from jwt_registration.serializers import UserSerializer
 from company.models import Company, Position, ProjectPosition, Project, Department
 from company.signals import create_company_position, create_project_position
 from unittest.mock import patch, MagicMock
@@ -170,11 +175,11 @@ class ProjectSerializerTestCase(TestCase):
         )
         self.project.positions.add(self.position1, self.position2)
 
-        self.project_position = ProjectPosition.objects.create(
+        self.project_position = ProjectPosition.objects.update_or_create(
             position=self.position1,
             project=self.project,
-            project_access_weight=ProjectPosition.WeightChoices.FULL_ACCESS
-        )
+            defaults={'project_access_weight': ProjectPosition.WeightChoices.FULL_ACCESS}
+        )[0]
         self.project.position_projects.add(self.project_position)
         self.department = Department.objects.create(
             title='test_title_department',
@@ -210,3 +215,53 @@ class ProjectSerializerTestCase(TestCase):
         serializer.is_valid(raise_exception=True)
         updated_instance = serializer.save()
         self.assertEqual(list(updated_instance.departments.all()), [self.department])
+
+
+class FastRepresentationTestCase(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create(email='test_email_1@gmail.com')
+        self.company = Company.objects.create(title='test_company')
+        self.position = Position.objects.create(
+            title='test_position', access_weight=Position.WeightChoices.MINIMUM_ACCESS, company=self.company)
+        self.project = Project.objects.create(title='test_project', company=self.company)
+        self.parent = Department.objects.create(title='test_parent', company=self.company)
+        self.department = Department.objects.create(
+            title='test_department', description='test_description', company=self.company,
+            parent=self.parent, owner=self.user.email)
+
+    def assertSameRepresentation(self, serializer_class, instances):
+        serializer = serializer_class()
+        renderer = JSONRenderer()
+        for instance in instances:
+            self.assertEqual(
+                renderer.render(serializer.to_representation(instance)),
+                renderer.render(serializers.Serializer.to_representation(serializer, instance))
+            )
+
+    def test_user_serializer(self):
+        self.assertSameRepresentation(UserSerializer, [self.user])
+
+    def test_department_serializer(self):
+        self.assertSameRepresentation(DepartmentNoUsersSerializer, [self.parent, self.department])
+
+    def test_position_serializers(self):
+        positions = list(Position.objects.filter(company=self.company).prefetch_related('project_positions'))
+        with translation.override('ru'):
+            self.assertSameRepresentation(ExternalAPIRequestPositionNoUsersSerializer, positions)
+            self.assertSameRepresentation(PositionForProjectSerializer, positions)
+            self.assertEqual(
+                ExternalAPIRequestPositionNoUsersSerializer(self.position).data['access_weight'],
+                self.position.get_access_weight_display()
+            )
+
+    def test_nested_list_uses_fast_path(self):
+        data = DepartmentTreeSerializer([self.parent], many=True, context={'children': {
+            self.parent.id: [self.department]}}).data
+        self.assertEqual(data[0]['children'][0]['parent'], self.parent.id)
+        self.assertEqual(data[0]['children'][0]['children'], [])
+
+    def test_validated_data_falls_back_to_drf(self):
+        serializer = UserSerializer(data={'email': 'test_email_2@gmail.com'})
+        serializer.is_valid(raise_exception=True)
+        self.assertEqual(serializer.data, {'email': 'test_email_2@gmail.com'})
@@ -0,0 +1,47 @@
+from unittest.mock import patch
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.exceptions import ValidationError
+
+from company.models import Company, Position
+from company.services import provision_company
+from jwt_registration.models import User
+
+
+@patch('company.services.notify_users_created')
+class ProvisionCompanyTestCase(TestCase):
+
+    def setUp(self):
+        self.owner = User.objects.create(email='owner@gmail.com')
+        self.company_data = {'title': 'test_company_title', 'description': 'test_company_description'}
+
+    def test_provision_company(self, notify_users_created):
+        with self.captureOnCommitCallbacks(execute=True):
+            company = provision_company(self.company_data, [self.owner.email, 'invited@gmail.com'])
+
+        self.assertEqual(set(company.users.values_list('email', flat=True)), {self.owner.email, 'invited@gmail.com'})
+        position = Position.objects.get(company=company)
+        self.assertEqual(position.access_weight, Position.WeightChoices.OWNER)
+        self.assertEqual(list(position.users.all()), [self.owner])
+        notify_users_created.delay.assert_called_once_with(['invited@gmail.com'])
+
+    def test_query_count_does_not_depend_on_users(self, notify_users_created):
+        User.objects.bulk_create([User(email=f'user_{index}@gmail.com') for index in range(50)])
+        with CaptureQueriesContext(connection) as few_users:
+            provision_company({'title': 'first'}, [self.owner.email, 'user_1@gmail.com'])
+        with CaptureQueriesContext(connection) as many_users:
+            provision_company({'title': 'second'}, [self.owner.email] + [f'user_{index}@gmail.com' for index in range(50)])
+        self.assertEqual(len(many_users), len(few_users))
+
+    def test_provision_with_differently_cased_email(self, notify_users_created):
+        User.objects.create(email='Invited@gmail.com')
+        company = provision_company(self.company_data, [self.owner.email, 'invited@gmail.com'])
+        self.assertEqual(company.users.count(), 2)
+
+    def test_duplicate_title_for_owner(self, notify_users_created):
+        provision_company(self.company_data, [self.owner.email])
+        with self.assertRaises(ValidationError):
+            provision_company(self.company_data, [self.owner.email])
+        self.assertEqual(Company.objects.filter(title=self.company_data['title']).count(), 1)
@@ -1,7 +1,9 @@
 from django.db.models.signals import post_save
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from jwt_registration.models import User
-from company.models import Company, Position, Project
+from company.models import Company, Position, Project, Department, ProjectAccess
 from company.signals import create_company_position, create_project_position
 from rest_framework.exceptions import ValidationError
 
@@ -75,3 +77,76 @@ class CreateProjectPositionTestCase(TestCase):
         self.assertTrue(project.positions.filter(id=self.position1.id).exists())
         self.assertTrue(project.positions.filter(id=self.position2.id).exists())
         self.assertEqual(project.position_projects.count(), 2)
+
+
+class UpdateDepartmentPathTestCase(TestCase):
+
+    def setUp(self):
+        self.company = Company.objects.create(title='Test Company')
+        self.root = Department.objects.create(title='root', company=self.company)
+        self.child = Department.objects.create(title='child', company=self.company, parent=self.root)
+        self.grandchild = Department.objects.create(title='grandchild', company=self.company, parent=self.child)
+
+    def test_path_on_create(self):
+        self.assertEqual(self.root.path, f'{self.root.id}/')
+        self.assertEqual(self.grandchild.path, f'{self.root.id}/{self.child.id}/{self.grandchild.id}/')
+
+    def test_path_on_move(self):
+        new_root = Department.objects.create(title='new_root', company=self.company)
+        self.child.parent = new_root
+        self.child.save()
+
+        self.grandchild.refresh_from_db()
+        self.assertEqual(self.grandchild.path, f'{new_root.id}/{self.child.id}/{self.grandchild.id}/')
+        self.assertEqual(self.grandchild.get_ancestor_ids(), [new_root.id, self.child.id])
+
+
+class ProjectAccessSignalsTestCase(TestCase):
+
+    def setUp(self):
+        self.company = Company.objects.create(title='Test Company')
+        self.user = User.objects.create(email='member@gmail.com')
+        self.position = Position.objects.create(
+            title='Position', company=self.company, access_weight=Position.WeightChoices.MINIMUM_ACCESS)
+        self.position.users.add(self.user)
+        self.project = Project.objects.create(title='Project', company=self.company)
+
+    def add_positions(self, count):
+        for index in range(count):
+            Position.objects.create(title=f'extra_{index}', company=self.company).users.add(self.user)
+
+    def test_project_delete_does_not_depend_on_positions(self):
+        with CaptureQueriesContext(connection) as few_positions:
+            Project.objects.create(title='few', company=self.company).delete()
+        self.add_positions(5)
+        with CaptureQueriesContext(connection) as many_positions:
+            Project.objects.create(title='many', company=self.company).delete()
+        self.assertEqual(len(many_positions), len(few_positions))
+
+    def test_position_delete_rebuilds_access_once(self):
+        strong_position = Position.objects.create(
+            title='strong', company=self.company, access_weight=Position.WeightChoices.FULL_ACCESS)
+        strong_position.users.add(self.user)
+        other_project = Project.objects.create(title='other', company=self.company)
+
+        with CaptureQueriesContext(connection) as queries:
+            strong_position.delete()
+        self.assertEqual(len([query for query in queries if 'DELETE FROM "company_projectaccess"' in query['sql']]), 1)
+        self.assertEqual(
+            set(ProjectAccess.objects.filter(user=self.user).values_list('project_id', 'access_weight')),
+            {(self.project.id, Position.WeightChoices.MINIMUM_ACCESS),
+             (other_project.id, Position.WeightChoices.MINIMUM_ACCESS)}
+        )
+
+    def test_position_save_rebuilds_only_on_weight_change(self):
+        self.position.description = 'new description'
+        with CaptureQueriesContext(connection) as queries:
+            self.position.save()
+        self.assertFalse([query for query in queries if 'company_projectaccess' in query['sql']])
+
+        self.position.access_weight = Position.WeightChoices.FULL_ACCESS
+        self.position.save()
+        self.assertEqual(
+            ProjectAccess.objects.get(user=self.user, project=self.project).access_weight,
+            Position.WeightChoices.FULL_ACCESS
+        )
@@ -0,0 +1,194 @@
+import json
+from datetime import timedelta
+from unittest.mock import patch
+
+from django.conf import settings
+from django.core import mail
+from django.core.cache import cache
+from django.core.mail.backends.locmem import EmailBackend
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from kombu import Connection, Queue
+
+from company.changes import get_outbox_exchange, record_change
+from company.models import ChangeLog
+from celery_app import app as celery_app, debug_task
+from company.tasks import (
+    notify_users_created, send_invitation_batch, drain_change_outbox, import_users_chunk, prune_change_log)
+
+
+@override_settings(EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend')
+class SendInvitationBatchTestCase(TestCase):
+
+    def setUp(self):
+        self.emails = ['test_email_1@gmail.com', 'test_email_2@gmail.com', 'test_email_3@gmail.com']
+
+    def test_send_batch(self):
+        result = send_invitation_batch(self.emails)
+
+        self.assertEqual(result, {'sent': 3, 'failed': 0})
+        self.assertEqual([message.to for message in mail.outbox], [[email] for email in self.emails])
+
+    @patch('company.tasks.send_invitation_batch.apply_async')
+    def test_failed_recipients_are_retried(self, apply_async):
+        original_send = EmailBackend.send_messages
+
+        def send_messages(backend, messages):
+            if messages[0].to == [self.emails[1]]:
+                raise ConnectionError('smtp error')
+            return original_send(backend, messages)
+
+        with patch('django.core.mail.backends.locmem.EmailBackend.send_messages', send_messages):
+            result = send_invitation_batch(self.emails)
+
+        self.assertEqual(result, {'sent': 2, 'failed': 1})
+        apply_async.assert_called_once()
+        self.assertEqual(apply_async.call_args.args[0], ([self.emails[1]],))
+        self.assertEqual(apply_async.call_args.args[1], {'attempt': 1})
+
+    @override_settings(INVITATION_EMAIL_BATCH_SIZE=2)
+    @patch('company.tasks.group')
+    def test_large_lists_are_split(self, group):
+        result = notify_users_created(self.emails)
+
+        self.assertEqual(result, {'batches': 2})
+        signatures = list(group.call_args.args[0])
+        self.assertEqual([signature.args[0] for signature in signatures], [self.emails[:2], self.emails[2:]])
+
+
+@override_settings(OUTBOX_BROKER_URL='memory://', OUTBOX_BATCH_SIZE=2, CHANGE_FEED_STREAM_KEY='')
+class DrainChangeOutboxTestCase(TestCase):
+
+    def setUp(self):
+        ChangeLog.objects.all().delete()
+        self.connection = Connection('memory://')
+        self.queue = Queue('test_company_changes', get_outbox_exchange(), routing_key='company.#')
+        self.consumer_queue = self.connection.SimpleQueue(self.queue)
+        self.consumer_queue.clear()
+        for object_id in range(3):
+            record_change(1, 'project', object_id, ChangeLog.Action.CREATE)
+        record_change(2, 'position', 10, ChangeLog.Action.ADD, 'user', [3, 1])
+
+    def tearDown(self):
+        self.consumer_queue.close()
+        self.connection.release()
+
+    def get_messages(self):
+        messages = []
+        while True:
+            try:
+                message = self.consumer_queue.get(block=False)
+            except self.consumer_queue.Empty:
+                return messages
+            message.ack()
+            messages.append(message)
+
+    def test_drain_publishes_all_changes_in_batches(self):
+        self.assertEqual(drain_change_outbox(), 4)
+
+        messages = self.get_messages()
+        self.assertEqual([message.payload['object_id'] for message in messages], [0, 1, 2, 10])
+        self.assertEqual(messages[-1].delivery_info['routing_key'], 'company.2.position.add')
+        self.assertEqual(messages[-1].payload['related_ids'], [1, 3])
+        self.assertFalse(ChangeLog.objects.filter(published_at__isnull=True).exists())
+        self.assertEqual([message.payload['sequence'] for message in messages], [1, 2, 3, 4])
+
+    def test_concurrent_drain_is_skipped(self):
+        cache.add(settings.OUTBOX_LOCK_CACHE_KEY, 'other worker')
+        self.addCleanup(cache.delete, settings.OUTBOX_LOCK_CACHE_KEY)
+        self.assertEqual(drain_change_outbox(), 0)
+        self.assertFalse(ChangeLog.objects.filter(sequence__isnull=True).exists())
+        self.assertEqual(ChangeLog.objects.filter(published_at__isnull=True).count(), 4)
+
+    def test_published_changes_are_not_sent_again(self):
+        drain_change_outbox()
+        self.get_messages()
+        record_change(1, 'project', 0, ChangeLog.Action.DELETE)
+
+        self.assertEqual(drain_change_outbox(), 1)
+        self.assertEqual([message.payload['action'] for message in self.get_messages()], ['delete'])
+
+    @override_settings(CHANGE_FEED_STREAM_KEY='company_changes')
+    @patch('company.changes.get_stream_client')
+    def test_drain_appends_changes_to_stream(self, get_stream_client):
+        pipeline = get_stream_client.return_value.pipeline.return_value
+        drain_change_outbox()
+
+        self.assertEqual(pipeline.xadd.call_count, 4)
+        (key, fields), options = pipeline.xadd.call_args
+        self.assertEqual(key, 'company_changes')
+        self.assertEqual((fields['company_id'], json.loads(fields['change'])['object_id']), (2, 10))
+        self.assertTrue(options['approximate'])
+        self.assertEqual(pipeline.execute.call_count, 2)
+
+    @override_settings(CHANGE_FEED_STREAM_KEY='company_changes')
+    @patch('company.changes.get_stream_client')
+    def test_failed_stream_publish_keeps_changes_in_outbox(self, get_stream_client):
+        get_stream_client.return_value.pipeline.return_value.execute.side_effect = ConnectionError('redis is down')
+        self.assertEqual(drain_change_outbox(), 0)
+        self.assertEqual(ChangeLog.objects.filter(published_at__isnull=True).count(), 4)
+
+    @patch('kombu.messaging.Producer.publish', side_effect=ConnectionError('broker is down'))
+    def test_failed_publish_keeps_changes_in_outbox(self, publish):
+        self.assertEqual(drain_change_outbox(), 0)
+        self.assertEqual(ChangeLog.objects.filter(published_at__isnull=True).count(), 4)
+        # the feed cursor does not wait for the broker
+        self.assertEqual(
+            list(ChangeLog.objects.order_by('id').values_list('sequence', flat=True)), [1, 2, 3, 4])
+
+    def test_prune_keeps_retained_changes(self):
+        drain_change_outbox()
+        ChangeLog.objects.filter(sequence__lte=2).update(created_at=timezone.now() - timedelta(days=40))
+        self.assertEqual(prune_change_log(), 2)
+        self.assertEqual(list(ChangeLog.objects.values_list('sequence', flat=True)), [3, 4])
+
+
+class CeleryRoutingTestCase(TestCase):
+
+    def setUp(self):
+        self.connection = celery_app.connection_for_write('memory://')
+        self.queues = {name: self.connection.SimpleQueue(queue) for name, queue in celery_app.amqp.queues.items()}
+        for queue in self.queues.values():
+            queue.clear()
+
+    def tearDown(self):
+        for queue in self.queues.values():
+            queue.close()
+        self.connection.release()
+
+    def get_task_names(self, queue_name):
+        names = []
+        queue = self.queues[queue_name]
+        while True:
+            try:
+                message = queue.get(block=False)
+            except queue.Empty:
+                return names
+            message.ack()
+            names.append(message.headers['task'])
+
+    def test_tasks_are_routed_to_their_queues(self):
+        # results go to the redis backend, which is not part of this test
+        notify_users_created.apply_async((['test_email_1@gmail.com'],), connection=self.connection, ignore_result=True)
+        send_invitation_batch.apply_async((['test_email_1@gmail.com'],), connection=self.connection, ignore_result=True)
+        import_users_chunk.apply_async((1, [], 0), connection=self.connection)
+        drain_change_outbox.apply_async(connection=self.connection)
+        prune_change_log.apply_async(connection=self.connection)
+        debug_task.apply_async(connection=self.connection)
+
+        self.assertEqual(
+            self.get_task_names('mail'), ['company.tasks.notify_users_created', 'company.tasks.send_invitation_batch'])
+        self.assertEqual(
+            self.get_task_names('sync'), ['company.tasks.import_users_chunk', 'company.tasks.drain_change_outbox'])
+        self.assertEqual(
+            self.get_task_names('maintenance'), ['company.tasks.prune_change_log', 'celery_app.debug_task'])
+
+    def test_task_options(self):
+        self.assertEqual(celery_app.tasks['company.tasks.send_invitation_batch'].rate_limit, '30/m')
+        self.assertTrue(celery_app.tasks['company.tasks.import_users_chunk'].acks_late)
+        self.assertFalse(notify_users_created.ignore_result)
+        self.assertFalse(send_invitation_batch.ignore_result)
+        self.assertTrue(import_users_chunk.ignore_result)
+        self.assertTrue(drain_change_outbox.ignore_result)
+        self.assertEqual(celery_app.conf.worker_prefetch_multiplier, 1)
@@ -3,7 +3,9 @@ from django.urls import resolve
 from django.urls import reverse
 from rest_framework.routers import SimpleRouter
 
-from company.views import CompanyAPIViewSet, PositionAPIViewSet, ProjectAPIViewSet, DepartmentAPIViewSet
+from company.views import (
+    CompanyAPIViewSet, PositionAPIViewSet, ProjectAPIViewSet, DepartmentAPIViewSet, UsersInCompanyValidateView,
+    UsersInCompaniesValidateView, )
 
 
 class CompanyAPIRouterTestCase(TestCase):
@@ -58,3 +60,13 @@ class DepartmentAPIRouterTestCase(TestCase):
         url = reverse('company-department-detail', kwargs={'company_pk': 1, 'pk': 1})
         resolved_view = resolve(url).func.cls
         self.assertEqual(resolved_view, DepartmentAPIViewSet)
+
+
+class UserInCompanyValidateRouterTestCase(TestCase):
+    def test_users_in_company_batch_route(self):
+        url = reverse('users-in-company', kwargs={'company_pk': 1})
+        self.assertEqual(resolve(url).func.view_class, UsersInCompanyValidateView)
+
+    def test_users_in_companies_batch_route(self):
+        url = reverse('users-in-companies')
+        self.assertEqual(resolve(url).func.view_class, UsersInCompaniesValidateView)
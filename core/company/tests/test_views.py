@@ -1,7 +1,19 @@
-from django.db.models import Prefetch
+import base64
+import json
+from datetime import timedelta
+
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.contrib.auth.models import update_last_login
+from django.db import connection
+from django.db.models import Max, Prefetch
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
 from company.views import PositionAPIViewSet, ProjectAPIViewSet, CompanyAPIViewSet
-from company.models import Company, Position, Project, Department
+from company.cache import get_company_version
+from company.changes import prune_changes, record_change, sequence_changes
+from company.models import Company, Position, Project, Department, ProjectPosition, ChangeLog
 from company.serializers import ProjectPostSerializer, ProjectSerializer
 from jwt_registration.models import User
 from .test_base import BaseAPITestCase
@@ -58,19 +70,12 @@ class ProjectAPIViewSetTestCase(BaseAPITestCase):
         request = self.factory.get(url)
         self.view.setup(request, **kwargs)
 
-        prefetch_positions = Prefetch(
-            'positions',
-            queryset=Position.objects.filter(
-                company=kwargs['company_pk']).prefetch_related('project_positions')
-            .only('id', 'title', 'access_weight', 'project_positions__project_access_weight')
-        )
         prefetch_departments = Prefetch(
             'departments',
             queryset=Department.objects.filter(
                 company=kwargs['company_pk']).only('id', 'title')
         )
         correct_query = Project.objects.prefetch_related(
-            prefetch_positions,
             prefetch_departments,
             'users'
         ).filter(company=kwargs['company_pk'])
@@ -92,6 +97,51 @@ class ProjectAPIViewSetTestCase(BaseAPITestCase):
             self.assertEqual(self.view.get_serializer_class(),
                              ProjectSerializer)
 
+    def test_list_query_count_does_not_depend_on_projects(self):
+        url = reverse('company-project-list', kwargs={'company_pk': self.company.id})
+        Project.objects.create(title='project_1', company=self.company)
+        with CaptureQueriesContext(connection) as single_project:
+            self.client.get(url)
+
+        for index in range(2, 6):
+            Position.objects.create(title=f'position_{index}', company=self.company)
+            project = Project.objects.create(title=f'project_{index}', company=self.company)
+            project.users.add(self.user1)
+            project.departments.add(self.department)
+        with CaptureQueriesContext(connection) as many_projects:
+            response = self.client.get(url)
+
+        self.assertEqual(len(response.data['results']), 5)
+        self.assertEqual(len(many_projects), len(single_project))
+
+    def test_positions_are_limited_to_project(self):
+        first = Project.objects.create(title='project_1', company=self.company)
+        Project.objects.create(title='project_2', company=self.company)
+        ProjectPosition.objects.filter(position=self.position, project=first).update(
+            project_access_weight=ProjectPosition.WeightChoices.OBSERVE)
+
+        url = reverse('company-project-list', kwargs={'company_pk': self.company.id})
+        results = self.client.get(url).data['results']
+        positions = {
+            project['title']: next(position for position in project['positions'] if position['id'] == self.position.id)
+            for project in results
+        }
+        self.assertEqual(positions['project_1']['project_positions'], [ProjectPosition.WeightChoices.OBSERVE.label])
+        self.assertEqual(positions['project_2']['project_positions'], [ProjectPosition.WeightChoices.STANDARD.label])
+
+    def test_list_and_detail_render_positions_identically(self):
+        project = Project.objects.create(title='project_1', company=self.company)
+        Position.objects.create(title='position_2', company=self.company, access_weight=Position.WeightChoices.OBSERVE)
+        ProjectPosition.objects.filter(position=self.position, project=project).update(
+            project_access_weight=ProjectPosition.WeightChoices.OBSERVE)
+
+        results = self.client.get(reverse('company-project-list', kwargs={'company_pk': self.company.id})).data
+        detail = self.client.get(
+            reverse('company-project-detail', kwargs={'company_pk': self.company.id, 'pk': project.id})).data
+        listed = next(item for item in results['results'] if item['id'] == project.id)
+        self.assertEqual(listed['positions'], detail['positions'])
+        self.assertTrue(detail['positions'])
+
 
 class UserInCompanyValidateTest(BaseAPITestCase):
     def setUp(self):
@@ -118,3 +168,518 @@ class UserInCompanyValidateTest(BaseAPITestCase):
         self.assertEqual(response1.data['status'], 'User in company')
         self.assertEqual(response2.status_code, 400)
         self.assertEqual(response2.data['status'], 'User is not in company')
+
+    def test_post_missing_company(self):
+        response = self.client.post(
+            path=reverse('user-in-company', kwargs={'company_pk': self.company.id + 1000}),
+            data={'email': 'ali@gmail.com'},
+            format='json'
+        )
+        self.assertEqual(response.status_code, 404)
+
+    def test_post_is_cached_and_invalidated(self):
+        url = reverse('user-in-company', kwargs={'company_pk': self.company.id})
+        self.client.post(path=url, data={'email': 'ali@gmail.com'}, format='json')
+        with self.assertNumQueries(0):
+            response = self.client.post(path=url, data={'email': 'ali@gmail.com'}, format='json')
+        self.assertEqual(response.status_code, 200)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.company.users.remove(self.user)
+        response = self.client.post(path=url, data={'email': 'ali@gmail.com'}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_version_is_bumped_on_commit(self):
+        version = get_company_version(self.company.id)
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.company.users.remove(self.user)
+        self.assertEqual(get_company_version(self.company.id), version)
+        for callback in callbacks:
+            callback()
+        self.assertNotEqual(get_company_version(self.company.id), version)
+
+    def test_batch_post(self):
+        self.company.users.add(User.objects.create(email='bob@gmail.com'))
+        response = self.client.post(
+            path=reverse('users-in-company', kwargs={'company_pk': self.company.id}),
+            data={'emails': ['bob@gmail.com', 'sdff@gmail.com', 'ali@gmail.com']},
+            format='json'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['emails'], ['bob@gmail.com', 'ali@gmail.com'])
+
+    def test_pairs_post(self):
+        other_company = Company.objects.create(title='other_company')
+        other_company.users.add(User.objects.create(email='bob@gmail.com'))
+        pairs = [
+            [self.company.id, 'ali@gmail.com'],
+            {'company_id': other_company.id, 'email': 'ali@gmail.com'},
+            [other_company.id, 'bob@gmail.com'],
+            [self.company.id + 1000, 'bob@gmail.com'],
+        ]
+        with self.assertNumQueries(1):
+            response = self.client.post(path=reverse('users-in-companies'), data={'pairs': pairs}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['results'], [1, 0, 1, 0])
+
+    def test_pairs_post_invalid(self):
+        url = reverse('users-in-companies')
+        for pairs in ([], [[self.company.id]], [['abc', 'ali@gmail.com']], [{'company_id': self.company.id}]):
+            response = self.client.post(path=url, data={'pairs': pairs}, format='json')
+            self.assertEqual(response.status_code, 400)
+
+
+class KeysetPaginationTestCase(BaseAPITestCase):
+
+    def setUp(self):
+        for index in range(5):
+            Position.objects.create(
+                title=f'paginated_position_{index}',
+                access_weight=Position.WeightChoices.OBSERVE,
+                company=self.company
+            )
+        self.url = reverse('company-position-list', kwargs={'company_pk': self.company.id})
+
+    def test_pages_follow_access_weight_and_id(self):
+        expected_ids = list(
+            Position.objects.filter(company=self.company).order_by('access_weight', 'id').values_list('id', flat=True)
+        )
+        received_ids = []
+        url = f'{self.url}?page_size=2'
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertLessEqual(len(response.data['results']), 2)
+            received_ids += [position['id'] for position in response.data['results']]
+            url = response.data['next']
+        self.assertEqual(received_ids, expected_ids)
+
+    def test_deep_page_is_single_query(self):
+        response = self.client.get(f'{self.url}?page_size=2')
+        with self.assertNumQueries(2):
+            self.client.get(response.data['next'])
+
+    def test_invalid_cursor(self):
+        response = self.client.get(f'{self.url}?cursor=broken')
+        self.assertEqual(response.status_code, 404)
+
+    def test_cursor_with_wrong_value_types(self):
+        for values in (['a', 'x'], [1, None], [[1], 2]):
+            cursor = base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+            response = self.client.get(f'{self.url}?cursor={cursor}')
+            self.assertEqual(response.status_code, 404)
+
+    def test_export(self):
+        url = reverse('company-position-export', kwargs={'company_pk': self.company.id})
+        response = self.client.get(url)
+        data = json.loads(b''.join(response.streaming_content))
+        self.assertEqual(len(data), Position.objects.filter(company=self.company).count())
+
+
+class ProjectExportTestCase(BaseAPITestCase):
+
+    def setUp(self):
+        self.url = reverse('company-project-export', kwargs={'company_pk': self.company.id})
+
+    def export(self):
+        with CaptureQueriesContext(connection) as queries:
+            data = json.loads(b''.join(self.client.get(self.url).streaming_content))
+        return data, len(queries)
+
+    def test_query_count_does_not_depend_on_projects(self):
+        Project.objects.create(title='export_project_0', company=self.company)
+        few_data, few_projects = self.export()
+        for index in range(1, 6):
+            Project.objects.create(title=f'export_project_{index}', company=self.company)
+        many_data, many_projects = self.export()
+
+        self.assertEqual(many_projects, few_projects)
+        self.assertEqual(len(many_data), len(few_data) + 5)
+        self.assertEqual(
+            {position['id'] for position in many_data[-1]['positions']},
+            set(Position.objects.filter(company=self.company).values_list('id', flat=True))
+        )
+
+
+class UsersEmailStreamingTestCase(BaseAPITestCase):
+
+    def test_stream_matches_regular_response(self):
+        url = reverse('company-get-users-email-only', kwargs={'pk': self.company.id})
+        self.position.users.add(self.user1)
+        regular = self.client.get(url)
+        streamed = self.client.get(f'{url}?stream=true')
+        self.assertTrue(streamed.streaming)
+        self.assertEqual(
+            sorted(json.loads(b''.join(streamed.streaming_content)), key=lambda user: user['email']),
+            sorted(json.loads(regular.content), key=lambda user: user['email'])
+        )
+
+
+class BulkMembershipTestCase(BaseAPITestCase):
+
+    def setUp(self):
+        self.user3 = User.objects.create(email='test_email_3@gmail.com')
+        self.position.users.add(self.user1)
+
+    def test_add_position_users(self):
+        url = reverse('company-position-bulk-membership', kwargs={'company_pk': self.company.id, 'pk': self.position.id})
+        data = {'emails': [self.user1.email, self.user2.email, 'unknown@gmail.com']}
+        response = self.client.post(url, data, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, {'added': 1, 'removed': 0, 'unchanged': 1, 'invited': 0, 'not_found': 1})
+        self.assertEqual(set(self.position.users.all()), {self.user1, self.user2})
+
+    def test_remove_position_users(self):
+        url = reverse('company-position-bulk-membership', kwargs={'company_pk': self.company.id, 'pk': self.position.id})
+        data = {'emails': [self.user1.email, self.user2.email], 'is_remove': True}
+        response = self.client.post(url, data, format='json')
+
+        self.assertEqual(response.data['removed'], 1)
+        self.assertEqual(response.data['unchanged'], 1)
+        self.assertFalse(self.position.users.exists())
+
+    @patch('company.services.notify_users_created')
+    def test_add_company_users_invites_unknown(self, notify_users_created):
+        url = reverse('company-bulk-membership', kwargs={'pk': self.company.id})
+        data = {'emails': [self.user1.email, self.user3.email, 'invited@gmail.com']}
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(url, data, format='json')
+
+        self.assertEqual(response.data, {'added': 2, 'removed': 0, 'unchanged': 1, 'invited': 1, 'not_found': 0})
+        self.assertTrue(self.company.users.filter(email='invited@gmail.com', is_registered=False).exists())
+        notify_users_created.delay.assert_called_once_with(['invited@gmail.com'])
+
+
+class DepartmentTreeTestCase(BaseAPITestCase):
+
+    def setUp(self):
+        self.child = Department.objects.create(title='child', company=self.company, parent=self.department)
+        self.grandchild = Department.objects.create(title='grandchild', company=self.company, parent=self.child)
+        self.grandchild.users.add(self.user1)
+        self.kwargs = {'company_pk': self.company.id, 'pk': self.child.id}
+
+    def test_subtree(self):
+        response = self.client.get(reverse('company-department-subtree', kwargs=self.kwargs))
+        self.assertEqual([department['id'] for department in response.data], [self.child.id, self.grandchild.id])
+
+    def test_ancestors(self):
+        kwargs = {'company_pk': self.company.id, 'pk': self.grandchild.id}
+        response = self.client.get(reverse('company-department-ancestors', kwargs=kwargs))
+        self.assertEqual([department['id'] for department in response.data], [self.department.id, self.child.id])
+
+    def test_user_departments(self):
+        kwargs = {'company_pk': self.company.id, 'user_pk': self.user1.id}
+        response = self.client.get(reverse('company-department-user-departments', kwargs=kwargs))
+        self.assertEqual(
+            [department['id'] for department in response.data],
+            [self.department.id, self.child.id, self.grandchild.id]
+        )
+
+    def test_tree_query_count_does_not_depend_on_depth(self):
+        url = reverse('company-department-tree', kwargs={'company_pk': self.company.id})
+        with self.assertNumQueries(1):
+            response = self.client.get(url)
+        root = response.data[0]
+        self.assertEqual(root['id'], self.department.id)
+        self.assertEqual(root['children'][0]['children'][0]['id'], self.grandchild.id)
+
+    def test_move_into_own_subtree(self):
+        kwargs = {'company_pk': self.company.id, 'pk': self.department.id}
+        response = self.client.patch(
+            reverse('company-department-detail', kwargs=kwargs), {'parent': self.grandchild.id}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('parent', response.data)
+
+
+class ProjectAccessTestCase(BaseAPITestCase):
+
+    def setUp(self):
+        self.position.access_weight = Position.WeightChoices.MINIMUM_ACCESS
+        self.position.save()
+        self.member = User.objects.create(email='member@gmail.com')
+        self.position.users.add(self.member)
+        self.project = Project.objects.create(title='access_project', company=self.company)
+        self.url = reverse('company-project-access', kwargs={
+            'company_pk': self.company.id, 'pk': self.project.id, 'user_pk': self.member.id
+        })
+
+    def test_access_follows_position_weight(self):
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url)
+        self.assertEqual(response.data['access_weight'], Position.WeightChoices.MINIMUM_ACCESS.label)
+
+    def test_access_uses_strongest_weight(self):
+        ProjectPosition.objects.filter(position=self.position, project=self.project).update(
+            project_access_weight=ProjectPosition.WeightChoices.OBSERVE)
+        strong_position = Position.objects.create(
+            title='strong', company=self.company, access_weight=Position.WeightChoices.FULL_ACCESS)
+        strong_position.projects.add(self.project)
+        strong_position.users.add(self.member)
+
+        response = self.client.get(self.url)
+        self.assertEqual(response.data['access_weight'], Position.WeightChoices.FULL_ACCESS.label)
+
+        strong_position.users.remove(self.member)
+        response = self.client.get(self.url)
+        self.assertEqual(response.data['access_weight'], Position.WeightChoices.OBSERVE.label)
+
+    def test_access_not_found(self):
+        self.position.users.remove(self.member)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 404)
+
+
+class ProjectBulkCreateTestCase(BaseAPITestCase):
+
+    def setUp(self):
+        self.url = reverse('company-project-bulk-create', kwargs={'company_pk': self.company.id})
+        self.data = [
+            {
+                'title': f'imported_project_{index}',
+                'users': [{'email': self.user1.email}, {'email': 'unknown@gmail.com'}],
+                'departments': [self.department.id],
+            }
+            for index in range(3)
+        ]
+
+    def test_bulk_create(self):
+        response = self.client.post(self.url, self.data, format='json')
+
+        self.assertEqual(response.status_code, 201)
+        projects = Project.objects.filter(id__in=response.data['ids'])
+        position_count = Position.objects.filter(company=self.company).count()
+        self.assertEqual(ProjectPosition.objects.filter(project__in=projects).count(), 3 * position_count)
+        for project in projects:
+            self.assertEqual(list(project.users.all()), [self.user1])
+            self.assertEqual(list(project.departments.all()), [self.department])
+
+    def test_query_count_does_not_depend_on_projects(self):
+        with CaptureQueriesContext(connection) as few_projects:
+            self.client.post(self.url, self.data[:1], format='json')
+        with CaptureQueriesContext(connection) as many_projects:
+            self.client.post(self.url, self.data, format='json')
+        self.assertEqual(len(many_projects), len(few_projects))
+
+
+class CompanyCacheTestCase(BaseAPITestCase):
+
+    def setUp(self):
+        self.url = reverse('company-position-list', kwargs={'company_pk': self.company.id})
+
+    def test_cached_response(self):
+        first = self.client.get(self.url)
+        with self.assertNumQueries(0):
+            second = self.client.get(self.url)
+        self.assertEqual(first.data, second.data)
+        self.assertEqual(first['ETag'], second['ETag'])
+
+    def test_not_modified(self):
+        etag = self.client.get(self.url)['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+
+    def test_invalidated_on_change(self):
+        etag = self.client.get(self.url)['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.position.users.add(self.user2)
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        position = next(position for position in response.data['results'] if position['id'] == self.position.id)
+        self.assertIn(self.user2.email, [user['email'] for user in position['users']])
+
+
+class ProjectConditionalGetTestCase(BaseAPITestCase):
+
+    def setUp(self):
+        self.project = Project.objects.create(title='polled_project', company=self.company)
+        self.other_project = Project.objects.create(title='other_project', company=self.company)
+        self.url = reverse('company-project-detail', kwargs={'company_pk': self.company.id, 'pk': self.project.id})
+
+    def test_not_modified_without_prefetch(self):
+        response = self.client.get(self.url)
+        self.assertIn('Last-Modified', response)
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_if_modified_since(self):
+        last_modified = self.client.get(self.url)['Last-Modified']
+        response = self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 304)
+
+    def test_etag_depends_on_own_row(self):
+        etag = self.client.get(self.url)['ETag']
+        self.other_project.users.add(self.user1)
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        self.project.users.add(self.user1)
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([user['email'] for user in response.data['users']], [self.user1.email])
+
+    def test_etag_changes_with_embedded_user(self):
+        member = User.objects.create(email='member@gmail.com')
+        self.project.users.add(member)
+        etag = self.client.get(self.url)['ETag']
+        member.email = 'renamed@gmail.com'
+        member.save()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([user['email'] for user in response.data['users']], ['renamed@gmail.com'])
+
+        etag = response['ETag']
+        member.delete()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['users'], [])
+
+    def test_etag_ignores_unrendered_changes(self):
+        position = Position.objects.create(title='polled_position', company=self.company)
+        project = Project.objects.create(title='positioned_project', company=self.company)
+        member = User.objects.create(email='member@gmail.com')
+        project.users.add(member)
+        url = reverse('company-project-detail', kwargs={'company_pk': self.company.id, 'pk': project.id})
+        etag = self.client.get(url)['ETag']
+        version = get_company_version(self.company.id)
+        with self.captureOnCommitCallbacks(execute=True):
+            update_last_login(None, member)
+            member.is_staff = True
+            member.save()
+        self.assertEqual(get_company_version(self.company.id), version)
+        with self.captureOnCommitCallbacks(execute=True):
+            position.description = 'new description'
+            position.save()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            position.title = 'renamed_position'
+            position.save()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_bulk_user_delete_is_handled_once(self):
+        members = User.objects.bulk_create([User(email=f'member_{index}@gmail.com') for index in range(5)])
+        self.project.users.add(*members)
+        etag = self.client.get(self.url)['ETag']
+        with CaptureQueriesContext(connection) as queries:
+            User.objects.filter(email__startswith='member_').delete()
+        self.assertEqual(len([query for query in queries if 'UPDATE "company_project"' in query['sql']]), 1)
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_list_etag_changes_on_delete(self):
+        url = reverse('company-project-list', kwargs={'company_pk': self.company.id})
+        etag = self.client.get(url)['ETag']
+        self.other_project.delete()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+class ChangeFeedTestCase(BaseAPITestCase):
+
+    def setUp(self):
+        self.url = reverse('company-changes', kwargs={'pk': self.company.id})
+        sequence_changes()
+        self.since = ChangeLog.objects.aggregate(sequence=Max('sequence'))['sequence'] or 0
+
+    def test_feed_returns_only_new_changes(self):
+        project = Project.objects.create(title='feed_project', company=self.company)
+        self.position.users.remove(self.user1)
+
+        # no drain and no broker: the feed sequences committed changes itself
+        response = self.client.get(self.url, {'since': self.since})
+        changes = [(change['model'], change['object_id'], change['action']) for change in response.data['results']]
+        self.assertIn(('project', project.id, 'create'), changes)
+        self.assertIn(('position', self.position.id, 'remove'), changes)
+        self.assertFalse(response.data['has_more'])
+
+        response = self.client.get(self.url, {'since': response.data['next_since']})
+        self.assertEqual(response.data['results'], [])
+
+    def test_feed_does_not_skip_late_commits(self):
+        in_flight, = record_change(self.company.id, 'project', 1, ChangeLog.Action.CREATE)
+        in_flight_id = in_flight.id
+        in_flight.delete()
+        record_change(self.company.id, 'project', 2, ChangeLog.Action.CREATE)
+        next_since = self.client.get(self.url, {'since': self.since}).data['next_since']
+
+        # the lower id commits after the consumer already moved past the higher one
+        ChangeLog.objects.create(
+            id=in_flight_id, company_id=self.company.id, model='project', object_id=1, action=ChangeLog.Action.CREATE)
+        response = self.client.get(self.url, {'since': next_since})
+        self.assertEqual([change['id'] for change in response.data['results']], [in_flight_id])
+
+    def test_feed_pagination(self):
+        for index in range(3):
+            Department.objects.create(title=f'feed_department_{index}', company=self.company)
+        response = self.client.get(self.url, {'since': self.since, 'limit': 2})
+        self.assertEqual(len(response.data['results']), 2)
+        self.assertTrue(response.data['has_more'])
+
+    def test_reverse_clear_and_user_delete_record_removals(self):
+        member = User.objects.create(email='feed_member@gmail.com')
+        self.company.users.add(member)
+        self.position.users.add(member, self.user1)
+        member_id = member.id
+        member.companies.clear()
+        member.delete()
+
+        response = self.client.get(self.url, {'since': self.since})
+        removals = [
+            (change['model'], change['object_id'], change['related_ids'])
+            for change in response.data['results'] if change['action'] == ChangeLog.Action.REMOVE
+        ]
+        self.assertEqual(removals, [('company', self.company.id, [member_id]), ('position', self.position.id, [member_id])])
+
+    def test_pruned_cursor_is_gone(self):
+        Department.objects.create(title='feed_department', company=self.company)
+        self.client.get(self.url, {'since': self.since})
+        ChangeLog.objects.update(created_at=timezone.now() - timedelta(days=settings.CHANGE_LOG_RETENTION_DAYS + 1))
+        Department.objects.create(title='retained_department', company=self.company)
+        self.client.get(self.url, {'since': self.since})
+        prune_changes()
+
+        self.assertEqual(self.client.get(self.url, {'since': self.since}).status_code, 410)
+        response = self.client.get(self.url)
+        self.assertEqual([change['object_id'] for change in response.data['results']],
+                         [Department.objects.get(title='retained_department').id])
+
+
+class AsyncViewsTestCase(BaseAPITestCase):
+
+    def setUp(self):
+        self.position.users.add(self.user1)
+        self.validate_url = reverse('user-in-company-async', kwargs={'company_pk': self.company.id})
+        self.emails_url = reverse('company-users-emails-async', kwargs={'company_pk': self.company.id})
+
+    async def test_validate(self):
+        member = await self.async_client.post(
+            self.validate_url, {'email': self.user1.email}, content_type='application/json')
+        stranger = await self.async_client.post(
+            self.validate_url, {'email': 'stranger@gmail.com'}, content_type='application/json')
+
+        self.assertEqual((member.status_code, member.json()), (200, {'status': 'User in company'}))
+        self.assertEqual((stranger.status_code, stranger.json()), (400, {'status': 'User is not in company'}))
+
+    async def test_validate_errors(self):
+        invalid = await self.async_client.post(
+            self.validate_url, {'email': 'not an email'}, content_type='application/json')
+        missing = await self.async_client.post(
+            reverse('user-in-company-async', kwargs={'company_pk': self.company.id + 1000}),
+            {'email': self.user1.email}, content_type='application/json')
+
+        self.assertEqual(invalid.status_code, 400)
+        self.assertIn('email', invalid.json())
+        self.assertEqual((missing.status_code, missing.json()), (404, {'status': 'Company not found'}))
+
+    def test_users_emails_match_sync_view(self):
+        regular = self.client.get(reverse('company-get-users-email-only', kwargs={'pk': self.company.id}))
+        response = async_to_sync(self.async_client.get)(self.emails_url)
+        streamed = async_to_sync(self.async_client.get)(f'{self.emails_url}?stream=true')
+
+        async def read(response):
+            return b''.join([chunk async for chunk in response.streaming_content])
+
+        self.assertEqual(response.content, regular.content)
+        self.assertEqual(async_to_sync(read)(streamed), regular.content)
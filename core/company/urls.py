@@ -1,7 +1,10 @@
 from django.urls import path, include
 from rest_framework_nested.routers import NestedSimpleRouter
 
-from company.views import CompanyAPIViewSet, PositionAPIViewSet, ProjectAPIViewSet, DepartmentAPIViewSet, UserInCompanyValidateView
+from company.views import (
+    CompanyAPIViewSet, PositionAPIViewSet, ProjectAPIViewSet, DepartmentAPIViewSet,
+    UserInCompanyValidateView, UsersInCompanyValidateView, UsersInCompaniesValidateView,
+    UserInCompanyAsyncValidateView, CompanyUsersEmailsAsyncView, )
 from rest_framework.routers import SimpleRouter
 
 
@@ -27,4 +30,12 @@ urlpatterns = [
     path('', include(department_router.urls)),
     path('<int:company_pk>/', UserInCompanyValidateView.as_view(),
          name='user-in-company'),
+    path('<int:company_pk>/batch/', UsersInCompanyValidateView.as_view(),
+         name='users-in-company'),
+    path('batch/', UsersInCompaniesValidateView.as_view(),
+         name='users-in-companies'),
+    path('<int:company_pk>/async/', UserInCompanyAsyncValidateView.as_view(),
+         name='user-in-company-async'),
+    path('<int:company_pk>/users-emails/async/', CompanyUsersEmailsAsyncView.as_view(),
+         name='company-users-emails-async'),
 ]
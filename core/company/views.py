@@ -1,44 +1,225 @@
-from django.db.models import Prefetch
-from drf_spectacular.utils import extend_schema
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.decorators import method_decorator
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from django.utils.http import parse_etags, parse_http_date_safe, http_date
+from django.db.models import Prefetch, Max, Count
+from django.shortcuts import get_object_or_404
+from drf_spectacular.utils import extend_schema, OpenApiParameter
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.viewsets import ModelViewSet
 from rest_framework.generics import GenericAPIView
 from rest_framework import status
+from rest_framework.exceptions import APIException, ValidationError
+from rest_framework.parsers import MultiPartParser
+from rest_framework.renderers import JSONRenderer
 
+from core.pagination import KeysetPagination
+from core.streaming import StreamingExportMixin, streaming_json_response, astreaming_json_response
 from company.serializers import (
     CompanySerializer, PositionSerializer, DepartmentSerializer,
-    ProjectSerializer, ProjectPostSerializer, )
-from users.serializers import UserEmailSerializer
-from company.models import Company, Position, Project, Department
+    ProjectSerializer, ProjectPostSerializer, BulkMembershipSerializer, BulkMembershipReportSerializer,
+    DepartmentTreeSerializer, ProjectAccessSerializer, ProjectImportSerializer,
+    ChangeFeedSerializer, ChangeLogSerializer, UserImportUploadSerializer, UserImportSerializer, )
+from company.services import bulk_update_members, bulk_create_projects
+from users.serializers import UserEmailSerializer, UserEmailListSerializer, MembershipPairListSerializer
+from company.cache import (
+    is_user_in_company, ais_user_in_company, users_in_company, pairs_in_companies, get_company_version, )
+from company.changes import get_oldest_sequence, sequence_changes
+from company.imports import get_import_format, open_import_file, read_import_rows, run_user_import
+from company.models import Company, Position, Project, Department, ProjectAccess, ChangeLog, UserImport
 from jwt_registration.models import User
 from users.serializers import OnlyUserEmailSerializer
 
 
+def get_company_users(company_id):
+    # to_attr prefetches assign plain lists instead of building a related manager per user
+    return User.objects.filter(companies=company_id).only('email', ).prefetch_related(
+        Prefetch('positions', to_attr='prefetched_positions'),
+        Prefetch('departments', to_attr='prefetched_departments'),
+    )
+
+
+def render_json(data, status_code=status.HTTP_200_OK):
+    return HttpResponse(JSONRenderer().render(data), status=status_code, content_type='application/json')
+
+
+class BulkMembershipMixin:
+    invite_unknown_users = False
+
+    @extend_schema(request=BulkMembershipSerializer, responses=BulkMembershipReportSerializer)
+    @action(detail=True, methods=['POST'], url_path='users-bulk')
+    def bulk_membership(self, request, *args, **kwargs):
+        serializer = BulkMembershipSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        queryset = self.filter_queryset(self.get_queryset()).prefetch_related(None)
+        instance = get_object_or_404(queryset, pk=kwargs['pk'])
+        report = bulk_update_members(
+            instance, serializer.validated_data['emails'],
+            is_remove=serializer.validated_data['is_remove'],
+            invite=self.invite_unknown_users
+        )
+        return Response(report, status=status.HTTP_200_OK)
+
+
+class CompanyCacheMixin:
+    conditional_field = None
+
+    def get_cache_company_id(self):
+        return self.kwargs.get('company_pk')
+
+    def get_row_version(self, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset()).prefetch_related(None).order_by()
+        if 'pk' in kwargs:
+            last_modified = queryset.filter(pk=kwargs['pk']).values_list(self.conditional_field, flat=True).first()
+            if last_modified is None:
+                return None, None
+            count = 1
+        else:
+            aggregate = queryset.aggregate(last_modified=Max(self.conditional_field), count=Count('pk'))
+            last_modified, count = aggregate['last_modified'], aggregate['count']
+        timestamp = int(last_modified.timestamp() * 1_000_000) if last_modified else 0
+        return f'{count}.{timestamp}', last_modified
+
+    def is_not_modified(self, request, etag, last_modified):
+        if_none_match = request.headers.get('If-None-Match')
+        if if_none_match:
+            return etag in parse_etags(if_none_match)
+        if_modified_since = parse_http_date_safe(request.headers.get('If-Modified-Since', ''))
+        return bool(last_modified and if_modified_since and int(last_modified.timestamp()) <= if_modified_since)
+
+    def get_cached_response(self, handler, request, *args, **kwargs):
+        company_id = self.get_cache_company_id()
+        if company_id is None:
+            return handler(request, *args, **kwargs)
+
+        last_modified = None
+        if self.conditional_field:
+            version, last_modified = self.get_row_version(**kwargs)
+            if version is None:
+                return handler(request, *args, **kwargs)
+        else:
+            version = get_company_version(company_id)
+        digest = hashlib.md5(
+            f'{request.accepted_renderer.format}:{request.build_absolute_uri()}'.encode()).hexdigest()
+        etag = f'"{company_id}-{version}-{digest[:16]}"'
+        headers = {'ETag': etag}
+        if last_modified:
+            headers['Last-Modified'] = http_date(last_modified.timestamp())
+        if self.is_not_modified(request, etag, last_modified):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+        key = settings.COMPANY_RESPONSE_CACHE_KEY.format(company_id=company_id, version=version, digest=digest)
+        data = cache.get(key)
+        if data is None:
+            response = handler(request, *args, **kwargs)
+            if response.status_code != status.HTTP_200_OK:
+                return response
+            cache.set(key, response.data, settings.CACHE_LIFE_TIME)
+        else:
+            response = Response(data)
+        for header, value in headers.items():
+            response[header] = value
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.get_cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.get_cached_response(super().retrieve, request, *args, **kwargs)
+
+
 @extend_schema(
     tags=["Company"],
 )
-class CompanyAPIViewSet(ModelViewSet):
+class CompanyAPIViewSet(CompanyCacheMixin, BulkMembershipMixin, StreamingExportMixin, ModelViewSet):
+    invite_unknown_users = True
     serializer_class = CompanySerializer
+    pagination_class = KeysetPagination
     queryset = Company.objects.prefetch_related('users').all()
 
+    def get_cache_company_id(self):
+        return self.kwargs.get('pk')
+
     def get_users_for_company(self):
-        company = self.kwargs['pk']
-        return User.objects.filter(companies=company).only('email', ).prefetch_related('positions', 'departments')
+        return get_company_users(self.kwargs['pk'])
 
-    @extend_schema(responses=OnlyUserEmailSerializer, request=OnlyUserEmailSerializer)
+    @extend_schema(
+        responses=OnlyUserEmailSerializer, request=OnlyUserEmailSerializer,
+        parameters=[OpenApiParameter('stream', bool, description='stream users in server-side cursor chunks')]
+    )
     @action(detail=True, methods=['GET'], url_path='users-emails')
     def get_users_email_only(self, request, *args, **kwargs):
         queryset = self.get_users_for_company()
+        if request.query_params.get('stream') in ('1', 'true'):
+            return streaming_json_response(queryset, OnlyUserEmailSerializer)
         serializer = OnlyUserEmailSerializer(queryset, many=True)
         return Response(serializer.data)
 
+    @extend_schema(
+        responses=ChangeFeedSerializer,
+        parameters=[
+            OpenApiParameter('since', int, description='sequence of the last change the consumer has seen'),
+            OpenApiParameter('limit', int),
+        ]
+    )
+    @action(detail=True, methods=['GET'])
+    def changes(self, request, *args, **kwargs):
+        try:
+            since = int(request.query_params.get('since', 0))
+            limit = min(int(request.query_params.get('limit', settings.CHANGE_FEED_PAGE_SIZE)),
+                        settings.CHANGE_FEED_PAGE_SIZE)
+        except ValueError:
+            raise ValidationError({'error': 'since and limit must be integers'})
+        sequence_changes()
+        oldest = get_oldest_sequence()
+        if since and oldest is not None and since < oldest - 1:
+            return Response(
+                {'error': 'changes after since were pruned, resync the company'}, status=status.HTTP_410_GONE)
+        changes = list(
+            ChangeLog.objects.filter(company_id=kwargs['pk'], sequence__gt=since).order_by('sequence')[:limit + 1])
+        has_more = len(changes) > limit
+        changes = changes[:limit]
+        return Response({
+            'next_since': changes[-1].sequence if changes else since,
+            'has_more': has_more,
+            'results': ChangeLogSerializer(changes, many=True).data,
+        })
+
+    @extend_schema(request=UserImportUploadSerializer, responses=UserImportSerializer)
+    @action(detail=True, methods=['POST'], url_path='users/import', parser_classes=[MultiPartParser])
+    def import_users(self, request, *args, **kwargs):
+        serializer = UserImportUploadSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        company = get_object_or_404(Company.objects.only('id'), pk=kwargs['pk'])
+        file = serializer.validated_data['file']
+        import_format = get_import_format(file.name, serializer.validated_data.get('format'))
+        user_import = UserImport.objects.create(company=company)
+        run_user_import(
+            user_import, read_import_rows(open_import_file(file, import_format), import_format),
+            asynchronous=settings.USER_IMPORT_ASYNC
+        )
+        return Response(UserImportSerializer(user_import).data, status=status.HTTP_202_ACCEPTED)
+
+    @extend_schema(responses=UserImportSerializer)
+    @action(detail=True, methods=['GET'], url_path=r'imports/(?P<import_pk>\d+)')
+    def user_import(self, request, *args, **kwargs):
+        user_import = get_object_or_404(UserImport, pk=kwargs['import_pk'], company=kwargs['pk'])
+        return Response(UserImportSerializer(user_import).data)
+
 
 @extend_schema(
     tags=["Position"]
 )
-class PositionAPIViewSet(ModelViewSet):
+class PositionAPIViewSet(CompanyCacheMixin, BulkMembershipMixin, StreamingExportMixin, ModelViewSet):
     serializer_class = PositionSerializer
+    pagination_class = KeysetPagination
 
     def get_queryset(self):
         return Position.objects.prefetch_related('users').filter(company=self.kwargs['company_pk'])
@@ -47,8 +228,12 @@ class PositionAPIViewSet(ModelViewSet):
 @extend_schema(
     tags=["Project"]
 )
-class ProjectAPIViewSet(ModelViewSet):
+class ProjectAPIViewSet(CompanyCacheMixin, BulkMembershipMixin, StreamingExportMixin, ModelViewSet):
     http_method_names = ['get', 'post', 'patch', 'delete']
+    pagination_class = KeysetPagination
+    conditional_field = 'updated_at'
+    # every project carries all company positions, a smaller chunk keeps the positions map small
+    export_chunk_size = settings.PROJECT_EXPORT_CHUNK_SIZE
 
     def get_serializer_class(self):
         if self.request.method == 'POST':
@@ -57,29 +242,80 @@ class ProjectAPIViewSet(ModelViewSet):
 
     def get_queryset(self):
         company_id = self.kwargs.get('company_pk')
-        prefetch_positions = Prefetch(
-            'positions',
-            queryset=Position.objects.filter(
-                company=company_id).prefetch_related('project_positions')
-            .only('id', 'title', 'access_weight', 'project_positions__project_access_weight')
-        )
         prefetch_departments = Prefetch(
             'departments',
             queryset=Department.objects.filter(
                 company=company_id).only('id', 'title')
         )
-        return Project.objects.prefetch_related(prefetch_positions, prefetch_departments, 'users').filter(company=company_id)
+        return Project.objects.prefetch_related(prefetch_departments, 'users').filter(company=company_id)
+
+    @extend_schema(request=ProjectImportSerializer(many=True))
+    @action(detail=False, methods=['POST'], url_path='bulk')
+    def bulk_create(self, request, *args, **kwargs):
+        serializer = ProjectImportSerializer(
+            data=request.data, many=True, allow_empty=False, max_length=settings.PROJECT_IMPORT_MAX_PROJECTS)
+        serializer.is_valid(raise_exception=True)
+        get_object_or_404(Company.objects.only('id'), pk=kwargs['company_pk'])
+        projects = bulk_create_projects(kwargs['company_pk'], serializer.validated_data)
+        return Response({'ids': [project.id for project in projects]}, status=status.HTTP_201_CREATED)
+
+    @extend_schema(responses=ProjectAccessSerializer)
+    @action(detail=True, methods=['GET'], url_path=r'access/(?P<user_pk>\d+)')
+    def access(self, request, *args, **kwargs):
+        project_access = get_object_or_404(
+            ProjectAccess.objects.only('user_id', 'project_id', 'access_weight'),
+            project=kwargs['pk'], project__company=kwargs['company_pk'], user=kwargs['user_pk']
+        )
+        return Response(ProjectAccessSerializer(project_access).data)
 
 
 @extend_schema(
     tags=["Department"]
 )
-class DepartmentAPIViewSet(ModelViewSet):
+class DepartmentAPIViewSet(CompanyCacheMixin, BulkMembershipMixin, StreamingExportMixin, ModelViewSet):
     serializer_class = DepartmentSerializer
+    pagination_class = KeysetPagination
 
     def get_queryset(self):
         return Department.objects.prefetch_related('users').filter(company=self.kwargs['company_pk'])
 
+    def get_department_path(self):
+        return get_object_or_404(
+            Department.objects.filter(company=self.kwargs['company_pk']).values_list('path', flat=True),
+            pk=self.kwargs['pk']
+        )
+
+    @action(detail=True, methods=['GET'])
+    def subtree(self, request, *args, **kwargs):
+        queryset = self.get_queryset().filter(path__startswith=self.get_department_path()).order_by('path')
+        return Response(self.get_serializer(queryset, many=True).data)
+
+    @action(detail=True, methods=['GET'])
+    def ancestors(self, request, *args, **kwargs):
+        department = Department(path=self.get_department_path())
+        queryset = self.get_queryset().filter(id__in=department.get_ancestor_ids()).order_by('path')
+        return Response(self.get_serializer(queryset, many=True).data)
+
+    @action(detail=False, methods=['GET'], url_path=r'users/(?P<user_pk>\d+)')
+    def user_departments(self, request, *args, **kwargs):
+        paths = Department.objects.filter(
+            company=self.kwargs['company_pk'], users=kwargs['user_pk']).values_list('path', flat=True)
+        department_ids = {
+            int(department_id) for path in paths for department_id in path.split('/')[:-1]
+        }
+        queryset = self.get_queryset().filter(id__in=department_ids).order_by('path')
+        return Response(self.get_serializer(queryset, many=True).data)
+
+    @extend_schema(responses=DepartmentTreeSerializer(many=True))
+    @action(detail=False, methods=['GET'])
+    def tree(self, request, *args, **kwargs):
+        departments = Department.objects.filter(company=self.kwargs['company_pk']).order_by('path')
+        children = {}
+        for department in departments:
+            children.setdefault(department.parent_id, []).append(department)
+        serializer = DepartmentTreeSerializer(children.get(None, []), many=True, context={'children': children})
+        return Response(serializer.data)
+
 
 @extend_schema(
     tags=['UserInCompanyValidate']
@@ -89,10 +325,61 @@ class UserInCompanyValidateView(GenericAPIView):
 
     def post(self, request, *args, **kwargs):
         serializer = UserEmailSerializer(data=request.data)
-        if serializer.is_valid():
-            user_in_company = Company.objects.get(id=self.kwargs['company_pk']).users.filter(
-                email=serializer.data.get('email', None)).exists()
-            if user_in_company:
-                return Response({'status': 'User in company'}, status=status.HTTP_200_OK)
-            else:
-                return Response({'status': 'User is not in company'}, status=status.HTTP_400_BAD_REQUEST)
+        serializer.is_valid(raise_exception=True)
+        if is_user_in_company(self.kwargs['company_pk'], serializer.validated_data['email']):
+            return Response({'status': 'User in company'}, status=status.HTTP_200_OK)
+        return Response({'status': 'User is not in company'}, status=status.HTTP_400_BAD_REQUEST)
+
+
+@extend_schema(
+    tags=['UserInCompanyValidate']
+)
+class UsersInCompanyValidateView(GenericAPIView):
+    serializer_class = UserEmailListSerializer
+
+    def post(self, request, *args, **kwargs):
+        serializer = UserEmailListSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        emails = users_in_company(self.kwargs['company_pk'], serializer.validated_data['emails'])
+        return Response({'emails': emails}, status=status.HTTP_200_OK)
+
+
+@extend_schema(
+    tags=['UserInCompanyValidate']
+)
+class UsersInCompaniesValidateView(GenericAPIView):
+    serializer_class = MembershipPairListSerializer
+
+    def post(self, request, *args, **kwargs):
+        serializer = MembershipPairListSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return Response({'results': pairs_in_companies(serializer.validated_data['pairs'])}, status=status.HTTP_200_OK)
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class UserInCompanyAsyncValidateView(View):
+
+    async def post(self, request, company_pk):
+        try:
+            serializer = UserEmailSerializer(data=json.loads(request.body or b'{}'))
+        except ValueError as error:
+            return render_json({'detail': f'JSON parse error - {error}'}, status.HTTP_400_BAD_REQUEST)
+        if not serializer.is_valid():
+            return render_json(serializer.errors, status.HTTP_400_BAD_REQUEST)
+        try:
+            is_member = await ais_user_in_company(company_pk, serializer.validated_data['email'])
+        except APIException as error:
+            return render_json(error.detail, error.status_code)
+        if is_member:
+            return render_json({'status': 'User in company'})
+        return render_json({'status': 'User is not in company'}, status.HTTP_400_BAD_REQUEST)
+
+
+class CompanyUsersEmailsAsyncView(View):
+
+    async def get(self, request, company_pk):
+        queryset = get_company_users(company_pk)
+        if request.GET.get('stream') in ('1', 'true'):
+            return astreaming_json_response(queryset, OnlyUserEmailSerializer)
+        serializer = OnlyUserEmailSerializer()
+        return render_json([serializer.to_representation(user) async for user in queryset])
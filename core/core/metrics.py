@@ -0,0 +1,107 @@
+import threading
+from bisect import bisect_left
+from collections import defaultdict
+
+from django.conf import settings
+from django.http import Http404, HttpResponse
+
+
+def _format_labels(names, values):
+    return ','.join(f'{name}="{value}"' for name, value in zip(names, values))
+
+
+class Counter:
+
+    def __init__(self, name, description, labels):
+        self.name = name
+        self.description = description
+        self.labels = labels
+        self.values = defaultdict(float)
+        self.lock = threading.Lock()
+
+    def inc(self, labels, value=1):
+        with self.lock:
+            self.values[labels] += value
+
+    def collect(self):
+        yield f'# HELP {self.name} {self.description}'
+        yield f'# TYPE {self.name} counter'
+        with self.lock:
+            values = list(self.values.items())
+        for labels, value in values:
+            yield f'{self.name}{{{_format_labels(self.labels, labels)}}} {value}'
+
+
+class Histogram:
+
+    def __init__(self, name, description, labels, buckets):
+        self.name = name
+        self.description = description
+        self.labels = labels
+        self.buckets = tuple(buckets)
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def observe(self, labels, value):
+        with self.lock:
+            counts = self.values.setdefault(labels, [0] * (len(self.buckets) + 1) + [0.0])
+            counts[bisect_left(self.buckets, value)] += 1
+            counts[-1] += value
+
+    def collect(self):
+        yield f'# HELP {self.name} {self.description}'
+        yield f'# TYPE {self.name} histogram'
+        with self.lock:
+            values = [(labels, list(counts)) for labels, counts in self.values.items()]
+        for labels, counts in values:
+            label_text = _format_labels(self.labels, labels)
+            cumulative = 0
+            for bucket, count in zip(self.buckets + ('+Inf',), counts):
+                cumulative += count
+                yield f'{self.name}_bucket{{{label_text},le="{bucket}"}} {cumulative}'
+            yield f'{self.name}_sum{{{label_text}}} {counts[-1]}'
+            yield f'{self.name}_count{{{label_text}}} {cumulative}'
+
+
+REQUESTS = Counter(
+    'http_requests_total', 'Handled requests.', ('view', 'method', 'status'))
+REQUEST_DURATION = Histogram(
+    'http_request_duration_seconds', 'Time spent handling the request.', ('view', 'method'),
+    settings.REQUEST_METRICS_DURATION_BUCKETS)
+DB_QUERIES = Histogram(
+    'http_request_db_queries', 'Database queries per request.', ('view', 'method'),
+    settings.REQUEST_METRICS_QUERY_BUCKETS)
+DB_DURATION = Histogram(
+    'http_request_db_duration_seconds', 'Time spent in the database per request.', ('view', 'method'),
+    settings.REQUEST_METRICS_DURATION_BUCKETS)
+RESPONSE_SIZE = Histogram(
+    'http_response_size_bytes', 'Response body size.', ('view', 'method'),
+    settings.REQUEST_METRICS_SIZE_BUCKETS)
+
+
+def observe_request(record):
+    labels = (record['view'], record['method'])
+    REQUESTS.inc(labels + (record['status'],))
+    REQUEST_DURATION.observe(labels, record['duration_ms'] / 1000)
+    if record['db_queries'] is not None:
+        DB_QUERIES.observe(labels, record['db_queries'])
+        DB_DURATION.observe(labels, record['db_ms'] / 1000)
+    if record['response_bytes'] is not None:
+        RESPONSE_SIZE.observe(labels, record['response_bytes'])
+
+
+def render_metrics():
+    lines = [
+        line for metric in (REQUESTS, REQUEST_DURATION, DB_QUERIES, DB_DURATION, RESPONSE_SIZE)
+        for line in metric.collect()
+    ]
+    return '\n'.join(lines) + '\n'
+
+
+def metrics_view(request):
+    # counters name every view, so only the scraper on an internal address gets them
+    if not settings.REQUEST_METRICS_PROMETHEUS:
+        raise Http404
+    if request.META.get('REMOTE_ADDR') not in settings.REQUEST_METRICS_ALLOWED_IPS:
+        raise Http404
+    return HttpResponse(render_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')
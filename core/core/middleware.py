@@ -0,0 +1,109 @@
+import sys
+from time import perf_counter
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connection
+from loguru import logger
+
+from core.metrics import observe_request
+
+_log_sink_id = None
+
+
+def write_metrics_record(message):
+    # looked up per record so a redirected stdout receives it
+    sys.stdout.write(message)
+
+
+def configure_metrics_logging():
+    global _log_sink_id
+    if _log_sink_id is None:
+        # records are logged at TRACE, below the level of loguru's default stderr handler,
+        # so only this sink receives them and the other handlers are left alone
+        _log_sink_id = logger.add(
+            write_metrics_record, serialize=True, level='TRACE',
+            filter=lambda record: 'request_metrics' in record['extra']
+        )
+
+
+class RequestMetricsMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+        if settings.REQUEST_METRICS_LOG:
+            configure_metrics_logging()
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        request.metrics = {'db_queries': 0, 'db_ms': 0.0, 'serialization_ms': 0.0}
+
+        def record_query(execute, sql, params, many, context):
+            started = perf_counter()
+            try:
+                return execute(sql, params, many, context)
+            finally:
+                request.metrics['db_queries'] += 1
+                request.metrics['db_ms'] += (perf_counter() - started) * 1000
+
+        started = perf_counter()
+        with connection.execute_wrapper(record_query):
+            response = self.get_response(request)
+        duration = (perf_counter() - started) * 1000
+
+        self.record(request, response, duration)
+        return response
+
+    async def __acall__(self, request):
+        # ORM calls of async views run in sync_to_async threads, so their queries are not visible here
+        request.metrics = {'db_queries': None, 'db_ms': None, 'serialization_ms': 0.0}
+        started = perf_counter()
+        response = await self.get_response(request)
+        duration = (perf_counter() - started) * 1000
+
+        self.record(request, response, duration)
+        return response
+
+    def process_template_response(self, request, response):
+        started = perf_counter()
+
+        def record_render(response):
+            request.metrics['serialization_ms'] = (perf_counter() - started) * 1000
+
+        response.add_post_render_callback(record_render)
+        return response
+
+    @staticmethod
+    def get_company_id(resolver_match):
+        kwargs = resolver_match.kwargs
+        if 'company_pk' in kwargs:
+            return kwargs['company_pk']
+        if resolver_match.url_name and resolver_match.url_name.startswith('company-'):
+            return kwargs.get('pk')
+        return None
+
+    def record(self, request, response, duration):
+        resolver_match = request.resolver_match
+        record = {
+            'view': resolver_match.view_name if resolver_match else 'unresolved',
+            'company_id': self.get_company_id(resolver_match) if resolver_match else None,
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'duration_ms': round(duration, 3),
+            'db_queries': request.metrics['db_queries'],
+            'db_ms': None if request.metrics['db_ms'] is None else round(request.metrics['db_ms'], 3),
+            'serialization_ms': round(request.metrics['serialization_ms'], 3),
+            'response_bytes': None if response.streaming else len(response.content),
+        }
+        if settings.REQUEST_METRICS_PROMETHEUS:
+            observe_request(record)
+        if settings.REQUEST_METRICS_LOG:
+            logger.bind(request_metrics=record).trace(
+                '{} {} {} {}ms', record['method'], record['view'], record['status'], record['duration_ms'])
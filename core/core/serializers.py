@@ -0,0 +1,76 @@
+from operator import attrgetter
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db import models
+from django.utils.translation import get_language
+from rest_framework import serializers
+from rest_framework.fields import SkipField
+from rest_framework.relations import PKOnlyObject
+
+SIMPLE_FIELD_CONVERTERS = {
+    serializers.IntegerField: int,
+    serializers.CharField: str,
+    serializers.EmailField: str,
+    serializers.ReadOnlyField: None,
+}
+
+_choice_labels = {}
+
+
+def get_choice_display(choices, value):
+    key = (choices, get_language())
+    labels = _choice_labels.get(key)
+    if labels is None:
+        labels = _choice_labels[key] = {choice.value: str(choice.label) for choice in choices}
+    return labels.get(value, value)
+
+
+class FastRepresentationMixin:
+
+    def get_representation_plan(self):
+        plan = self.__dict__.get('_representation_plan')
+        if plan is None:
+            plan = self._representation_plan = [
+                (field.field_name, self.get_field_getter(field)) for field in self._readable_fields
+            ]
+        return plan
+
+    def get_field_getter(self, field):
+        if isinstance(field, serializers.SerializerMethodField):
+            return getattr(self, field.method_name)
+
+        if len(field.source_attrs) == 1:
+            source = field.source_attrs[0]
+            field_type = type(field)
+            if field_type in SIMPLE_FIELD_CONVERTERS:
+                convert = SIMPLE_FIELD_CONVERTERS[field_type]
+                if convert is None:
+                    return attrgetter(source)
+
+                def get_simple(instance):
+                    value = getattr(instance, source)
+                    return None if value is None else convert(value)
+                return get_simple
+
+            if field_type is serializers.PrimaryKeyRelatedField and field.pk_field is None:
+                try:
+                    return attrgetter(self.Meta.model._meta.get_field(source).attname)
+                except FieldDoesNotExist:
+                    pass
+
+        def get_field(instance):
+            attribute = field.get_attribute(instance)
+            value = attribute.pk if isinstance(attribute, PKOnlyObject) else attribute
+            return None if value is None else field.to_representation(attribute)
+        return get_field
+
+    def to_representation(self, instance):
+        if not isinstance(instance, models.Model):
+            return super().to_representation(instance)
+        ret = {}
+        for field_name, getter in self.get_representation_plan():
+            try:
+                ret[field_name] = getter(instance)
+            except SkipField:
+                pass
+        return ret
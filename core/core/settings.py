@@ -1,8 +1,11 @@
+import importlib.util
 import os
 from pathlib import Path
 
+from celery.schedules import crontab
 from corsheaders.defaults import default_headers
 from dotenv import load_dotenv
+from kombu import Queue
 import socket
 
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -16,7 +19,7 @@ SECRET_KEY = 'django-insecure-ops07n=b3^773+h3(!(fv-5p$x9xk8g+a)b^$m1*@p%hmryt_n
 
 # SECURITY WARNING: don't run with debug turned on in production!
 load_dotenv()
-DEBUG = os.environ.get('IS_DEBUG', False)
+DEBUG = os.environ.get('IS_DEBUG', '').lower() in ('1', 'true', 'yes')
 
 ALLOWED_HOSTS = ["localhost", "92.63.67.98", '127.0.0.1']
 
@@ -32,7 +35,6 @@ INSTALLED_APPS = [
     'django.contrib.staticfiles',
 
     'rest_framework',
-    'debug_toolbar',
     'drf_spectacular',
     'corsheaders',
 
@@ -50,10 +52,21 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
-
-    "debug_toolbar.middleware.DebugToolbarMiddleware",
 ]
 
+REQUEST_METRICS = os.environ.get('REQUEST_METRICS', 'true').lower() in ('1', 'true', 'yes')
+REQUEST_METRICS_LOG = os.environ.get('REQUEST_METRICS_LOG', 'false').lower() in ('1', 'true', 'yes')
+REQUEST_METRICS_PROMETHEUS = os.environ.get('REQUEST_METRICS_PROMETHEUS', 'false').lower() in ('1', 'true', 'yes')
+REQUEST_METRICS_DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+REQUEST_METRICS_QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 500)
+REQUEST_METRICS_SIZE_BUCKETS = (1024, 10240, 102400, 1048576, 10485760)
+if REQUEST_METRICS:
+    MIDDLEWARE.insert(0, 'core.middleware.RequestMetricsMiddleware')
+
+if DEBUG:
+    INSTALLED_APPS.append('debug_toolbar')
+    MIDDLEWARE.append("debug_toolbar.middleware.DebugToolbarMiddleware")
+
 ROOT_URLCONF = 'core.urls'
 
 TEMPLATES = [
@@ -74,6 +87,9 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'core.wsgi.application'
 
+DB_POOL = os.environ.get('DB_POOL', '').lower() in ('1', 'true', 'yes')
+DB_PGBOUNCER = os.environ.get('DB_PGBOUNCER', '').lower() in ('1', 'true', 'yes')
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.postgresql',
@@ -81,10 +97,26 @@ DATABASES = {
         'NAME': os.environ.get('DB_NAME'),
         'USER': os.environ.get('DB_USER'),
         'PASSWORD': os.environ.get('DB_PASS'),
-        'PORT': '5433',
+        'PORT': os.environ.get('DB_PORT', '5433'),
+        'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 60)),
+        'CONN_HEALTH_CHECKS': True,
+        # pgbouncer in transaction mode can not keep a cursor open between transactions
+        'DISABLE_SERVER_SIDE_CURSORS': DB_PGBOUNCER,
+        'OPTIONS': {},
     }
 }
 
+# the native pool and prepare_threshold are available with psycopg 3 only
+if DB_POOL:
+    DATABASES['default']['CONN_MAX_AGE'] = 0
+    DATABASES['default']['OPTIONS']['pool'] = {
+        'min_size': int(os.environ.get('DB_POOL_MIN_SIZE', 2)),
+        'max_size': int(os.environ.get('DB_POOL_MAX_SIZE', 10)),
+        'timeout': int(os.environ.get('DB_POOL_TIMEOUT', 10)),
+    }
+if DB_PGBOUNCER and importlib.util.find_spec('psycopg') is not None:
+    DATABASES['default']['OPTIONS']['prepare_threshold'] = None
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -115,6 +147,11 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 REST_FRAMEWORK = {
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
 }
+# list endpoints opt in with pagination_class = KeysetPagination
+PAGE_SIZE = int(os.environ.get('API_PAGE_SIZE', 50))
+MAX_PAGE_SIZE = int(os.environ.get('API_MAX_PAGE_SIZE', 500))
+STREAMING_CHUNK_SIZE = 1000
+PROJECT_EXPORT_CHUNK_SIZE = 100
 
 CORS_ALLOW_ALL_ORIGINS = True
 
@@ -132,11 +169,35 @@ CACHES = {
         },
     }
 }
-CELERY_BROKER_URL = 'redis://redis:6380/0'
+CELERY_BROKER_URL = os.environ.get('CELERY_BROKER_URL', 'redis://redis:6380/0')
+CELERY_RESULT_BACKEND = os.environ.get('CELERY_RESULT_BACKEND', 'redis://redis:6380/2')
+CELERY_RESULT_EXPIRES = 60*60*24
+CELERY_TASK_IGNORE_RESULT = True
+CELERY_TASK_TRACK_STARTED = True
+CELERY_TASK_DEFAULT_QUEUE = 'sync'
+CELERY_TASK_QUEUES = (
+    Queue('mail', routing_key='mail'),
+    Queue('sync', routing_key='sync'),
+    Queue('maintenance', routing_key='maintenance'),
+)
+CELERY_TASK_ROUTES = {
+    'company.tasks.notify_users_created': {'queue': 'mail'},
+    'company.tasks.send_invitation_batch': {'queue': 'mail'},
+    'company.tasks.import_users_chunk': {'queue': 'sync'},
+    'company.tasks.drain_change_outbox': {'queue': 'sync'},
+    'company.tasks.prune_change_log': {'queue': 'maintenance'},
+    'celery_app.debug_task': {'queue': 'maintenance'},
+}
+CELERY_TASK_ANNOTATIONS = {
+    'company.tasks.send_invitation_batch': {'rate_limit': os.environ.get('INVITATION_EMAIL_RATE_LIMIT', '30/m')},
+    'company.tasks.import_users_chunk': {'acks_late': True, 'reject_on_worker_lost': True},
+}
+# long mail batches must not sit prefetched behind a busy worker process
+CELERY_WORKER_PREFETCH_MULTIPLIER = 1
 SPECTACULAR_SETTINGS = {
     'TITLE': 'API Schema',
     'DESCRIPTION': 'Guide for the REST API',
-    'VERSION': '1.0.0',
+    'VERSION': '2.0.0',
 }
 
 INTERNAL_IPS = [
@@ -145,6 +206,9 @@ INTERNAL_IPS = [
 
 hostname, _, ips = socket.gethostbyname_ex(socket.gethostname())
 INTERNAL_IPS += [".".join(ip.split(".")[:-1] + ["1"]) for ip in ips]
+REQUEST_METRICS_ALLOWED_IPS = INTERNAL_IPS + [
+    ip.strip() for ip in os.environ.get('REQUEST_METRICS_ALLOWED_IPS', '').split(',') if ip.strip()
+]
 
 AUTH_USER_MODEL = 'jwt_registration.User'
 
@@ -161,5 +225,53 @@ DEFAULT_FROM_EMAIL = EMAIL_HOST_USER
 SERVER_EMAIL = EMAIL_HOST_USER
 EMAIL_ADMIN = EMAIL_HOST_USER
 CACHE_LIFE_TIME = 60*60
+INVITATION_EMAIL_BATCH_SIZE = 100
+INVITATION_EMAIL_MAX_RETRIES = 3
+INVITATION_EMAIL_RETRY_BACKOFF = 60
 USER_TWO_COMMITS_CACHE_KEY = 'two_commits_{email}'
+REGISTRATION_CACHE_LIFE_TIME = CACHE_LIFE_TIME
+REGISTRATION_BATCH_MAX_USERS = 1000
+COMPANY_VERSION_CACHE_KEY = 'company_version_{company_id}'
+COMPANY_MEMBER_CACHE_KEY = 'company_member_{company_id}_{version}_{email}'
+COMPANY_RESPONSE_CACHE_KEY = 'company_response_{company_id}_{version}_{digest}'
+CHANGE_FEED_REDIS_URL = os.environ.get('CHANGE_FEED_REDIS_URL', 'redis://redis:6380/3')
+CHANGE_FEED_STREAM_KEY = 'company_changes'
+CHANGE_FEED_STREAM_MAXLEN = 100000
+CHANGE_FEED_PAGE_SIZE = 500
+OUTBOX_BROKER_URL = os.environ.get('OUTBOX_BROKER_URL', CELERY_BROKER_URL)
+OUTBOX_EXCHANGE = 'company_changes'
+OUTBOX_BATCH_SIZE = 500
+OUTBOX_MAX_BATCHES = 20
+OUTBOX_PUBLISH_MAX_RETRIES = 3
+OUTBOX_DRAIN_INTERVAL = 5
+OUTBOX_LOCK_CACHE_KEY = 'change_outbox_lock'
+OUTBOX_LOCK_TIMEOUT = 60
+CHANGE_SEQUENCE_LOCK_CACHE_KEY = 'change_sequence_lock'
+CHANGE_SEQUENCE_LOCK_TIMEOUT = 10
+CHANGE_LOG_RETENTION_DAYS = int(os.environ.get('CHANGE_LOG_RETENTION_DAYS', 30))
+CELERY_BEAT_SCHEDULE = {
+    'drain-change-outbox': {
+        'task': 'company.tasks.drain_change_outbox',
+        'schedule': OUTBOX_DRAIN_INTERVAL,
+        'options': {'expires': OUTBOX_DRAIN_INTERVAL},
+    },
+    'prune-change-log': {
+        'task': 'company.tasks.prune_change_log',
+        'schedule': crontab(hour=3, minute=0),
+    },
+}
+MEMBERSHIP_BATCH_MAX_EMAILS = 1000
+MEMBERSHIP_PAIRS_MAX = 5000
+BENCHMARK_COMPANY_TITLE = 'benchmark company'
+BENCHMARK_EMAIL_DOMAIN = 'benchmark.local'
+BENCHMARK_SERVER_NAME = 'localhost'
+BENCHMARK_BUDGET_FILE = BASE_DIR / 'benchmark_budget.json'
+BENCHMARK_BUDGET_HEADROOM = 1.5
+BENCHMARK_REFERENCE_ROUTE = 'user-detail GET'
+BENCHMARK_LATENCY_TOLERANCE = 2.0
+BULK_MEMBERSHIP_MAX_EMAILS = 5000
+USER_IMPORT_CHUNK_SIZE = 1000
+USER_IMPORT_MAX_ERRORS = 1000
+USER_IMPORT_ASYNC = os.environ.get('USER_IMPORT_ASYNC', 'true').lower() in ('1', 'true', 'yes')
+PROJECT_IMPORT_MAX_PROJECTS = 1000
 REGISTRATION_SERVICE_URL = 'http://92.63.67.98:8000/{}'
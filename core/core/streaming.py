@@ -0,0 +1,64 @@
+from itertools import islice
+
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from rest_framework.decorators import action
+from rest_framework.utils.encoders import JSONEncoder
+
+
+def stream_json_array(queryset, serializer_class, chunk_size=None, context=None):
+    chunk_size = chunk_size or settings.STREAMING_CHUNK_SIZE
+    encoder = JSONEncoder(ensure_ascii=False, separators=(',', ':'))
+    # serialized as a list per iterator chunk, so list serializers can batch their lookups
+    serializer = serializer_class(many=True, context=context)
+    instances = queryset.iterator(chunk_size=chunk_size)
+    yield '['
+    index = 0
+    while chunk := list(islice(instances, chunk_size)):
+        for data in serializer.to_representation(chunk):
+            if index:
+                yield ','
+            index += 1
+            yield encoder.encode(data)
+    yield ']'
+
+
+async def astream_json_array(queryset, serializer_class, chunk_size=None, context=None):
+    chunk_size = chunk_size or settings.STREAMING_CHUNK_SIZE
+    encoder = JSONEncoder(ensure_ascii=False, separators=(',', ':'))
+    serializer = serializer_class(context=context)
+    yield '['
+    index = 0
+    async for instance in queryset.aiterator(chunk_size=chunk_size):
+        if index:
+            yield ','
+        index += 1
+        yield encoder.encode(serializer.to_representation(instance))
+    yield ']'
+
+
+def streaming_json_response(queryset, serializer_class, chunk_size=None, context=None):
+    return StreamingHttpResponse(
+        stream_json_array(queryset, serializer_class, chunk_size, context),
+        content_type='application/json'
+    )
+
+
+def astreaming_json_response(queryset, serializer_class, chunk_size=None, context=None):
+    return StreamingHttpResponse(
+        astream_json_array(queryset, serializer_class, chunk_size, context),
+        content_type='application/json'
+    )
+
+
+class StreamingExportMixin:
+    export_chunk_size = None
+
+    @action(detail=False, methods=['GET'], url_path='export')
+    def export(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        return streaming_json_response(
+            queryset, self.get_serializer_class(), self.export_chunk_size,
+            context=self.get_serializer_context()
+        )
+
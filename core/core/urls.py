@@ -3,9 +3,12 @@ from django.contrib import admin
 from django.urls import path, include
 from drf_spectacular.views import SpectacularAPIView, SpectacularSwaggerView
 
+from core.metrics import metrics_view
+
 
 urlpatterns = [
     path('company-service/admin/', admin.site.urls),
+    path('company-service/internal/metrics/', metrics_view, name='metrics'),
     path('company-service/api/v1/company/users/', include('users.urls')),
     path('company-service/api/v1/company/registration/', include('jwt_registration.urls')),
     path('company-service/api/v1/company/', include('company.urls')),
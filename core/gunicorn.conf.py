@@ -0,0 +1,22 @@
+import multiprocessing
+import os
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:8002')
+
+# gthread keeps blocking ORM calls cheap, uvicorn.workers.UvicornWorker serves core.asgi
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread')
+wsgi_app = 'core.asgi:application' if 'uvicorn' in worker_class.lower() else 'core.wsgi:application'
+if 'uvicorn' in worker_class.lower():
+    # async views run their queries in sync_to_async threads, persistent connections there are never reused
+    os.environ['DB_CONN_MAX_AGE'] = '0'
+workers = int(os.environ.get('GUNICORN_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', 5))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', 30))
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 2000))
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', 200))
+
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG')
+errorlog = '-'
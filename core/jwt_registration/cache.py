@@ -0,0 +1,60 @@
+from functools import lru_cache
+
+import redis
+from django.conf import settings
+from django.core.cache import cache
+from django.core.cache.backends.redis import RedisCache, RedisSerializer
+from django.utils.module_loading import import_string
+
+
+def get_registration_cache_key(email):
+    return settings.USER_TWO_COMMITS_CACHE_KEY.format(email=email)
+
+
+def stage_registrations(users_data):
+    cache.set_many(
+        {get_registration_cache_key(data['email']): data for data in users_data},
+        settings.REGISTRATION_CACHE_LIFE_TIME
+    )
+
+
+def claim_registrations(emails):
+    keys = {get_registration_cache_key(email): email for email in dict.fromkeys(emails)}
+    if not keys:
+        return {}
+    if isinstance(cache, RedisCache):
+        return _getdel_many(keys)
+
+    # delete() reports whether the key was still there, so only one of concurrent claims wins
+    return {keys[key]: data for key, data in cache.get_many(keys).items() if cache.delete(key)}
+
+
+def _getdel_many(keys):
+    client, serializer = get_redis_client()
+    with client.pipeline(transaction=False) as pipe:
+        for key in keys:
+            pipe.getdel(cache.make_and_validate_key(key))
+        values = pipe.execute()
+    return {
+        email: serializer.loads(value)
+        for email, value in zip(keys.values(), values) if value is not None
+    }
+
+
+@lru_cache(maxsize=None)
+def get_redis_client():
+    # the cache API has no GETDEL, so claims talk to the cache's write server with a client of their own
+    config = settings.CACHES['default']
+    servers = config['LOCATION']
+    server = (servers.split(',') if isinstance(servers, str) else servers)[0]
+    options = dict(config.get('OPTIONS', {}))
+    serializer = options.pop('serializer', RedisSerializer)
+    if isinstance(serializer, str):
+        serializer = import_string(serializer)
+    for option in ('pool_class', 'parser_class'):
+        options.pop(option, None)
+    return redis.Redis.from_url(server, **options), serializer() if callable(serializer) else serializer
+
+
+def discard_registrations(emails):
+    cache.delete_many([get_registration_cache_key(email) for email in emails])
@@ -3,6 +3,7 @@ from django.core.mail import send_mail
 
 from jwt_registration.managers import UserManager
 from django.db import models
+from django.db.models.functions import Upper
 
 
 class User(AbstractBaseUser, PermissionsMixin):
@@ -16,6 +17,13 @@ class User(AbstractBaseUser, PermissionsMixin):
 
     objects = UserManager()
 
+    class Meta:
+        # not unique: provisioning and imports match emails exactly, so a case-insensitive
+        # constraint would turn every differently cased invite into an IntegrityError
+        indexes = [
+            models.Index(Upper('email'), name='user_email_upper_idx')
+        ]
+
     def __str__(self):
         return self.email
 
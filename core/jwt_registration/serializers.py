@@ -1,8 +1,10 @@
+from django.conf import settings
 from rest_framework import serializers
 from jwt_registration.models import User
+from core.serializers import FastRepresentationMixin
 
 
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(FastRepresentationMixin, serializers.ModelSerializer):
     email = serializers.EmailField(required=True)
 
     class Meta:
@@ -17,3 +19,16 @@ class UserSerializer(serializers.ModelSerializer):
             setattr(instance, attr, value)
         instance.save()
         return instance
+
+
+class RegistrationEmailListSerializer(serializers.Serializer):
+    emails = serializers.ListField(
+        child=serializers.EmailField(), allow_empty=False,
+        max_length=settings.REGISTRATION_BATCH_MAX_USERS
+    )
+
+
+class RegistrationReportSerializer(serializers.Serializer):
+    confirmed = serializers.ListField(child=serializers.EmailField())
+    already_confirmed = serializers.ListField(child=serializers.EmailField())
+    not_found = serializers.ListField(child=serializers.EmailField())
@@ -0,0 +1,40 @@
+from django.db import transaction
+
+from jwt_registration.cache import claim_registrations, discard_registrations, stage_registrations
+from jwt_registration.models import User
+
+
+def confirm_registrations(emails):
+    claimed = claim_registrations(emails)
+    try:
+        return save_registrations(emails, claimed)
+    except Exception:
+        # claiming removed the staged data, put it back so the confirm can be retried
+        stage_registrations(claimed.values())
+        raise
+
+
+@transaction.atomic
+def save_registrations(emails, claimed):
+    staged = {User.objects.normalize_email(data['email']): data for data in claimed.values()}
+    report = {'confirmed': [], 'already_confirmed': [], 'not_found': []}
+    if staged:
+        existing = set(User.objects.filter(email__in=staged).values_list('email', flat=True))
+        users = [User(**{**data, 'email': email, 'is_registered': True}) for email, data in staged.items()]
+        for user in users:
+            user.set_unusable_password()
+        # one INSERT ... ON CONFLICT: new users are created, invited ones only get is_registered flipped
+        User.objects.bulk_create(
+            users, update_conflicts=True, unique_fields=['email'], update_fields=['is_registered'])
+        report['confirmed'] = [email for email in staged if email not in existing]
+        report['already_confirmed'] = [email for email in staged if email in existing]
+
+    claimed = {data['email'] for data in staged.values()} | staged.keys()
+    report['not_found'] = [email for email in dict.fromkeys(emails) if email not in claimed]
+    return report
+
+
+@transaction.atomic
+def rollback_registrations(emails):
+    discard_registrations(emails)
+    User.objects.filter(email__in=emails).delete()
@@ -0,0 +1,49 @@
+from unittest.mock import MagicMock, patch
+
+from django.core.cache.backends.redis import RedisCache, RedisSerializer
+from django.test import TestCase, override_settings
+
+from jwt_registration import cache as registration_cache
+from jwt_registration.cache import claim_registrations, get_registration_cache_key, stage_registrations
+
+
+class ClaimRegistrationsTestCase(TestCase):
+
+    def test_claim_is_single_use(self):
+        stage_registrations([{'email': 'first@gmail.com'}, {'email': 'second@gmail.com'}])
+        self.assertEqual(
+            claim_registrations(['first@gmail.com', 'missing@gmail.com']),
+            {'first@gmail.com': {'email': 'first@gmail.com'}}
+        )
+        self.assertEqual(claim_registrations(['first@gmail.com']), {})
+        self.assertEqual(claim_registrations(['second@gmail.com']), {'second@gmail.com': {'email': 'second@gmail.com'}})
+
+    def test_redis_claim_uses_getdel_pipeline(self):
+        redis_cache = RedisCache('redis://localhost:6379', {})
+        pipe = MagicMock()
+        pipe.__enter__.return_value = pipe
+        pipe.execute.return_value = [RedisSerializer().dumps({'email': 'first@gmail.com'}), None]
+        client = MagicMock()
+        client.pipeline.return_value = pipe
+
+        with patch.object(registration_cache, 'cache', redis_cache), \
+                patch.object(registration_cache, 'get_redis_client', return_value=(client, RedisSerializer())):
+            claimed = claim_registrations(['first@gmail.com', 'missing@gmail.com'])
+
+        self.assertEqual(claimed, {'first@gmail.com': {'email': 'first@gmail.com'}})
+        pipe.getdel.assert_any_call(redis_cache.make_and_validate_key(get_registration_cache_key('first@gmail.com')))
+        self.assertEqual(pipe.getdel.call_count, 2)
+
+    @override_settings(CACHES={'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': 'redis://primary:6380,redis://replica:6380',
+        'OPTIONS': {'db': 1, 'serializer': 'django.core.cache.backends.redis.RedisSerializer'},
+    }})
+    def test_redis_client_uses_cache_write_server(self):
+        registration_cache.get_redis_client.cache_clear()
+        self.addCleanup(registration_cache.get_redis_client.cache_clear)
+
+        client, serializer = registration_cache.get_redis_client()
+        kwargs = client.connection_pool.connection_kwargs
+        self.assertEqual((kwargs['host'], kwargs['port'], kwargs['db']), ('primary', 6380, 1))
+        self.assertIsInstance(serializer, RedisSerializer)
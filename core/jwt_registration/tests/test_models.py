@@ -1,3 +1,6 @@
+from unittest import skipUnless
+
+from django.db import IntegrityError, connection
 from django.test import TestCase
 from jwt_registration.models import User
 from django.core import mail
@@ -32,3 +35,26 @@ class TestUserModelTestCase(TestCase):
         self.assertEqual(mail.outbox[0].body, self.mail_data['message'])
         self.assertEqual(mail.outbox[0].from_email, self.mail_data['from_email'])
         self.assertEqual(mail.outbox[0].to, [self.user.email])
+
+
+class UserEmailCaseTestCase(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create(email='Test_Email@gmail.com')
+
+    def test_email_is_unique_with_exact_case(self):
+        with self.assertRaises(IntegrityError):
+            User.objects.create(email='Test_Email@gmail.com')
+
+    def test_get_by_natural_key_matches_exact_case(self):
+        other = User.objects.create(email='test_email@gmail.com')
+        self.assertEqual(User.objects.get_by_natural_key('test_email@gmail.com'), other)
+        self.assertEqual(User.objects.get_by_natural_key('Test_Email@gmail.com'), self.user)
+        with self.assertRaises(User.DoesNotExist):
+            User.objects.get_by_natural_key('TEST_EMAIL@gmail.com')
+
+    @skipUnless(connection.vendor == 'postgresql', 'expression index plans are checked on PostgreSQL')
+    def test_iexact_lookup_uses_index(self):
+        with connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+        self.assertIn('user_email_upper_idx', User.objects.filter(email__iexact='test_email@gmail.com').explain())
@@ -30,4 +30,9 @@ class RegistrationAPIRouterTestCase(TestCase):
     def test_registration_rollback_route(self):
         url = reverse('user-rollback-user')
         resolved_view = resolve(url).func.cls
-        self.assertEqual(resolved_view, RegistrationAPIViewSet)
\ No newline at end of file
+        self.assertEqual(resolved_view, RegistrationAPIViewSet)
+
+    def test_registration_bulk_routes(self):
+        for name in ('user-bulk-create-users', 'user-bulk-confirm-users', 'user-bulk-rollback-users'):
+            resolved_view = resolve(reverse(name)).func.cls
+            self.assertEqual(resolved_view, RegistrationAPIViewSet)
@@ -1,4 +1,7 @@
+from unittest.mock import patch
+
 from django.core.cache import cache
+from django.db import DatabaseError
 from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APITestCase, APIRequestFactory
@@ -91,3 +94,70 @@ class RegistrationAPIViewSetTestCase(APITestCase):
         self.assertIsNone(cache.get(cache_key))
         user = User.objects.filter(email=self.data['email'])
         self.assertFalse(user.exists())
+
+    def test_confirm_user_is_claimed_once(self):
+        self.view.handle_cache(self.data['email'], 'set', self.data)
+        url = reverse('user-confirm-user')
+        self.assertEqual(self.client.post(url, self.data, format='json').status_code, status.HTTP_200_OK)
+        response = self.client.post(url, self.data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_confirm_user_marks_invited_user_registered(self):
+        User.objects.create(email=self.data['email'], is_registered=False)
+        self.view.handle_cache(self.data['email'], 'set', self.data)
+        response = self.client.post(reverse('user-confirm-user'), self.data, format='json')
+        self.assertEqual(response.data, {'status': 'already_confirmed'})
+        self.assertTrue(User.objects.get(email=self.data['email']).is_registered)
+
+
+    def test_failed_confirm_keeps_staged_user(self):
+        self.view.handle_cache(self.data['email'], 'set', self.data)
+        url = reverse('user-confirm-user')
+        with patch('jwt_registration.services.User.objects.bulk_create', side_effect=DatabaseError('db is gone')):
+            with self.assertRaises(DatabaseError):
+                self.client.post(url, self.data, format='json')
+        self.assertEqual(cache.get(self.view.get_cache_key(self.data['email'])), self.data)
+
+        response = self.client.post(url, self.data, format='json')
+        self.assertEqual(response.data, {'status': 'confirmed'})
+
+
+class BulkRegistrationTestCase(APITestCase):
+
+    def setUp(self):
+        self.emails = [f'bulk_user_{index}@gmail.com' for index in range(5)]
+
+    def test_bulk_flow(self):
+        response = self.client.post(
+            reverse('user-bulk-create-users'), [{'email': email} for email in self.emails], format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        User.objects.create(email=self.emails[0], is_registered=False)
+
+        # savepoint, existing emails, upsert, release
+        with self.assertNumQueries(4):
+            response = self.client.post(
+                reverse('user-bulk-confirm-users'), {'emails': self.emails + ['missing@gmail.com']}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, {
+            'confirmed': self.emails[1:], 'already_confirmed': self.emails[:1], 'not_found': ['missing@gmail.com']})
+        self.assertEqual(User.objects.filter(email__in=self.emails, is_registered=True).count(), 5)
+
+        response = self.client.post(reverse('user-bulk-confirm-users'), {'emails': self.emails}, format='json')
+        self.assertEqual(response.data['not_found'], self.emails)
+
+        response = self.client.post(reverse('user-bulk-rollback-users'), {'emails': self.emails}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(User.objects.filter(email__in=self.emails).exists())
+
+    def test_bulk_rollback_discards_staged_users(self):
+        self.client.post(reverse('user-bulk-create-users'), [{'email': email} for email in self.emails], format='json')
+        self.client.post(reverse('user-bulk-rollback-users'), {'emails': self.emails}, format='json')
+        response = self.client.post(reverse('user-bulk-confirm-users'), {'emails': self.emails}, format='json')
+        self.assertEqual(response.data['not_found'], self.emails)
+        self.assertFalse(User.objects.filter(email__in=self.emails).exists())
+
+    def test_bulk_invalid(self):
+        response = self.client.post(reverse('user-bulk-create-users'), [{'email': 'broken'}], format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.post(reverse('user-bulk-confirm-users'), {'emails': []}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
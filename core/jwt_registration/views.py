@@ -1,4 +1,3 @@
-from django.contrib.auth import get_user_model
 from rest_framework import status, mixins
 from rest_framework.decorators import action
 from rest_framework.response import Response
@@ -9,13 +8,18 @@ from drf_spectacular.utils import extend_schema
 from django.core.cache import cache
 from django.conf import settings
 
-from jwt_registration.serializers import UserSerializer
+from jwt_registration.cache import get_registration_cache_key, stage_registrations
+from jwt_registration.serializers import UserSerializer, RegistrationEmailListSerializer, RegistrationReportSerializer
+from jwt_registration.services import confirm_registrations, rollback_registrations
+from core.pagination import KeysetPagination
+from core.streaming import StreamingExportMixin
 
 
 @extend_schema(
     tags=["Create user"]
 )
 class RegistrationAPIViewSet(
+    StreamingExportMixin,
     mixins.RetrieveModelMixin,
     mixins.DestroyModelMixin,
     mixins.ListModelMixin,
@@ -23,6 +27,7 @@ class RegistrationAPIViewSet(
 ):
     queryset = User.objects.all()
     serializer_class = UserSerializer
+    pagination_class = KeysetPagination
 
     def perform_create(self, serializer):
         serializer.is_valid(raise_exception=True)
@@ -32,7 +37,7 @@ class RegistrationAPIViewSet(
         cache_key = self.get_cache_key(email)
         match action:
             case 'set' if data is not None:
-                cache.set(cache_key, data, settings.CACHE_LIFE_TIME)
+                cache.set(cache_key, data, settings.REGISTRATION_CACHE_LIFE_TIME)
             case 'get':
                 return cache.get(cache_key)
             case 'delete':
@@ -41,7 +46,7 @@ class RegistrationAPIViewSet(
                 raise ValueError(f"Invalid cache action: {action}")
 
     def get_cache_key(self, email):
-        return settings.USER_TWO_COMMITS_CACHE_KEY.format(email=email)
+        return get_registration_cache_key(email)
 
     @action(detail=False, methods=['post'], url_path='create')
     def create_user(self, request, *args, **kwargs):
@@ -55,24 +60,41 @@ class RegistrationAPIViewSet(
     def confirm_user(self, request, *args, **kwargs):
         email = get_email_or_400(request)
 
-        user_data = self.handle_cache(email, 'get')
-        if user_data:
-            self.handle_cache(email, 'delete')
-
-            user = get_user_model().objects.filter(email=email)
-            if user.exists():
-                user[0].is_registered = True
-                user[0].save()
-                return Response({'status': 'already_confirmed'}, status=status.HTTP_200_OK)
-            self.perform_create(self.get_serializer(data=user_data))
+        report = confirm_registrations([email])
+        if report['confirmed']:
             return Response({'status': 'confirmed'}, status=status.HTTP_200_OK)
+        if report['already_confirmed']:
+            return Response({'status': 'already_confirmed'}, status=status.HTTP_200_OK)
         return Response({'error': 'User not found'}, status=status.HTTP_404_NOT_FOUND)
 
     @action(detail=False, methods=['post'], url_path='rollback')
     def rollback_user(self, request, *args, **kwargs):
         email = get_email_or_400(request)
 
-        self.handle_cache(email, 'delete')
-        user = User.objects.filter(email=email)
-        if user.exists(): user.delete()
+        rollback_registrations([email])
+        return Response({'status': 'rolled back'}, status=status.HTTP_200_OK)
+
+    @extend_schema(request=UserSerializer(many=True))
+    @action(detail=False, methods=['post'], url_path='bulk/create')
+    def bulk_create_users(self, request, *args, **kwargs):
+        serializer = self.get_serializer(
+            data=request.data, many=True, allow_empty=False, max_length=settings.REGISTRATION_BATCH_MAX_USERS)
+        serializer.is_valid(raise_exception=True)
+        stage_registrations(serializer.validated_data)
+        return Response({'status': 'created'}, status=status.HTTP_200_OK)
+
+    @extend_schema(request=RegistrationEmailListSerializer, responses=RegistrationReportSerializer)
+    @action(detail=False, methods=['post'], url_path='bulk/confirm')
+    def bulk_confirm_users(self, request, *args, **kwargs):
+        serializer = RegistrationEmailListSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        report = confirm_registrations(serializer.validated_data['emails'])
+        return Response(report, status=status.HTTP_200_OK)
+
+    @extend_schema(request=RegistrationEmailListSerializer)
+    @action(detail=False, methods=['post'], url_path='bulk/rollback')
+    def bulk_rollback_users(self, request, *args, **kwargs):
+        serializer = RegistrationEmailListSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        rollback_registrations(serializer.validated_data['emails'])
         return Response({'status': 'rolled back'}, status=status.HTTP_200_OK)
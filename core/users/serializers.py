@@ -1,11 +1,13 @@
+from django.conf import settings
 from rest_framework import serializers
 from jwt_registration.models import User
 from company.serializers import DepartmentNoUsersSerializer, ExternalAPIRequestPositionNoUsersSerializer, CompanyForUserSerializer
+from core.serializers import FastRepresentationMixin
 
 
-class OnlyUserEmailSerializer(serializers.ModelSerializer):
-    positions = ExternalAPIRequestPositionNoUsersSerializer(many=True)
-    departments = DepartmentNoUsersSerializer(many=True)
+class OnlyUserEmailSerializer(FastRepresentationMixin, serializers.ModelSerializer):
+    positions = ExternalAPIRequestPositionNoUsersSerializer(many=True, source='prefetched_positions')
+    departments = DepartmentNoUsersSerializer(many=True, source='prefetched_departments')
 
     class Meta:
         model = User
@@ -22,3 +24,36 @@ class UserCompanySerializer(serializers.ModelSerializer):
 
 class UserEmailSerializer(serializers.Serializer):
     email = serializers.EmailField()
+
+
+class UserEmailListSerializer(serializers.Serializer):
+    emails = serializers.ListField(
+        child=serializers.EmailField(), allow_empty=False,
+        max_length=settings.MEMBERSHIP_BATCH_MAX_EMAILS
+    )
+
+
+class MembershipPairField(serializers.Field):
+    default_error_messages = {
+        'invalid': 'Expected a [company_id, email] pair or an object with company_id and email.',
+    }
+
+    def to_internal_value(self, data):
+        if isinstance(data, dict):
+            data = (data.get('company_id'), data.get('email'))
+        if not isinstance(data, (list, tuple)) or len(data) != 2:
+            self.fail('invalid')
+        company_id, email = data
+        if isinstance(company_id, bool) or not isinstance(email, str) or not email:
+            self.fail('invalid')
+        try:
+            return int(company_id), email
+        except (TypeError, ValueError):
+            self.fail('invalid')
+
+
+class MembershipPairListSerializer(serializers.Serializer):
+    pairs = serializers.ListField(
+        child=MembershipPairField(), allow_empty=False,
+        max_length=settings.MEMBERSHIP_PAIRS_MAX
+    )
@@ -4,13 +4,16 @@ from rest_framework.viewsets import ReadOnlyModelViewSet
 from jwt_registration.models import User
 from company.models import Company
 from users.serializers import UserCompanySerializer
+from core.pagination import KeysetPagination
+from core.streaming import StreamingExportMixin
 
 
 @extend_schema(
     tags=["User"]
     )
-class UserCompanyAPIViewSet(ReadOnlyModelViewSet):
+class UserCompanyAPIViewSet(StreamingExportMixin, ReadOnlyModelViewSet):
     serializer_class = UserCompanySerializer
+    pagination_class = KeysetPagination
 
     def get_queryset(self):
         company_prefetch = Prefetch(
@@ -0,0 +1,37 @@
+import argparse
+
+from load_test import run
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Compare how many in-flight membership checks one process sustains on the sync and async views.')
+    parser.add_argument('base_url', help='e.g. http://localhost:8002/company-service/api/v1/company/')
+    parser.add_argument('company_id', type=int)
+    parser.add_argument('email')
+    parser.add_argument('--levels', default='10,50,100,200,400', help='comma separated concurrency levels')
+    parser.add_argument('--duration', type=int, default=10)
+    parser.add_argument('--p95-limit', type=float, default=200, help='p95 in ms a level must stay under')
+    args = parser.parse_args()
+
+    base_url = args.base_url.rstrip('/')
+    urls = {
+        'sync': f'{base_url}/{args.company_id}/',
+        'async': f'{base_url}/{args.company_id}/async/',
+    }
+    levels = [int(level) for level in args.levels.split(',')]
+    capacity = dict.fromkeys(urls, 0)
+    print(f'{"view":<6} {"in-flight":>9} {"rps":>8} {"p50_ms":>8} {"p95_ms":>8} {"errors":>6}')
+    for level in levels:
+        for label, url in urls.items():
+            result = run(url, 'POST', {'email': args.email}, level, args.duration)
+            print(f'{label:<6} {level:>9} {result["rps"]:>8} {result["p50_ms"]:>8} '
+                  f'{result["p95_ms"]:>8} {result["errors"]:>6}')
+            if not result['errors'] and result['p95_ms'] is not None and result['p95_ms'] <= args.p95_limit:
+                capacity[label] = level
+    for label, level in capacity.items():
+        print(f'{label}: {level} in-flight requests within p95 {args.p95_limit}ms')
+
+
+if __name__ == '__main__':
+    main()
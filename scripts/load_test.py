@@ -0,0 +1,67 @@
+import argparse
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+
+def worker(url, method, body, deadline, latencies, errors, lock):
+    session = requests.Session()
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        try:
+            response = session.request(method, url, json=body, timeout=30)
+            failed = response.status_code >= 500
+        except requests.RequestException:
+            failed = True
+        elapsed = time.perf_counter() - started
+        with lock:
+            latencies.append(elapsed)
+            errors[0] += failed
+
+
+def run(url, method='GET', body=None, concurrency=10, duration=10):
+    latencies, errors, lock = [], [0], threading.Lock()
+    deadline = time.perf_counter() + duration
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for _ in range(concurrency):
+            executor.submit(worker, url, method, body, deadline, latencies, errors, lock)
+
+    latencies.sort()
+    return {
+        'requests': len(latencies),
+        'errors': errors[0],
+        'rps': round(len(latencies) / duration, 1),
+        'p50_ms': round(statistics.median(latencies) * 1000, 2) if latencies else None,
+        'p95_ms': round(latencies[int(len(latencies) * 0.95) - 1] * 1000, 2) if latencies else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure throughput of one company-service endpoint.')
+    parser.add_argument('url')
+    parser.add_argument('--method', default='GET')
+    parser.add_argument('--email', help='send {"email": ...} as JSON body, e.g. for the membership check')
+    parser.add_argument('--concurrency', type=int, default=10)
+    parser.add_argument('--duration', type=int, default=10)
+    parser.add_argument('--label', default='run')
+    parser.add_argument('--baseline-url', help='same endpoint on the current setup, e.g. runserver on :8001')
+    args = parser.parse_args()
+
+    body = {'email': args.email} if args.email else None
+    runs = [(args.label, args.url)]
+    if args.baseline_url:
+        runs.insert(0, ('baseline', args.baseline_url))
+
+    results = {}
+    for label, url in runs:
+        results[label] = run(url, args.method, body, args.concurrency, args.duration)
+        print(label, ' '.join(f'{key}={value}' for key, value in results[label].items()))
+    if args.baseline_url and results['baseline']['rps']:
+        print(f"speedup x{results[args.label]['rps'] / results['baseline']['rps']:.2f}")
+
+
+if __name__ == '__main__':
+    main()